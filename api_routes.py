@@ -3,206 +3,680 @@ API Routes for React Frontend
 Exposes existing functionality without changing core logic
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
-from pydantic import BaseModel
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 import asyncio
+import json
+import hashlib
+import binascii
+import time
+import os
+import zipfile
 from pathlib import Path
 import uuid
 from typing import Optional
 import inngest
 from dotenv import load_dotenv
+from concurrency import SingleFlight, AdmissionController, Overloaded, render_prometheus
+from services import (
+    FileService, InngestAPIService, UploadTooLargeError, InvalidPDFError, InvalidFilenameError, MAX_UPLOAD_BYTES
+)
+from custom_types import SavedUpload
+from bulk_query import answer_questions
+from vector_db import get_storage
+from rag_workflows import WORKFLOW_BACKEND, get_local_runner
+from shared_cache import cache_key, get_answer, put_answer, get_shared_cache
+import warmup
+from prompts import LLM_MODEL
+from file_catalog import get_catalog, UPLOADS_DIR, SORT_COLUMNS, TERMINAL_INGEST_STATUSES
 
 load_dotenv()
 
 router = APIRouter()
 
+# Batch uploads: files saved concurrently, capped per request
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+# PDFs per batch request and their total size, counting zip members uncompressed
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "1000"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(2 * 1024 * 1024 * 1024)))
+MAX_BULK_QUESTIONS = int(os.getenv("MAX_BULK_QUESTIONS", "1000"))
+SMALL_PDF_MAX_BYTES = int(os.getenv("SMALL_PDF_MAX_BYTES", str(256 * 1024)))
+
+# Admission control: bounded concurrency and wait queues per traffic lane
+query_admission = AdmissionController(
+    "query",
+    max_concurrent=int(os.getenv("QUERY_MAX_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("QUERY_MAX_QUEUE", "64")),
+    queue_timeout_s=float(os.getenv("QUERY_QUEUE_TIMEOUT_S", "10")),
+)
+bulk_admission = AdmissionController(
+    "bulk",
+    max_concurrent=int(os.getenv("BULK_MAX_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("BULK_MAX_QUEUE", "4")),
+    queue_timeout_s=float(os.getenv("BULK_QUEUE_TIMEOUT_S", "5")),
+)
+upload_admission = AdmissionController(
+    "upload",
+    max_concurrent=int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4")),
+    max_queue=int(os.getenv("UPLOAD_MAX_QUEUE", "32")),
+    queue_timeout_s=float(os.getenv("UPLOAD_QUEUE_TIMEOUT_S", "30")),
+)
+
+
+def _check_retrieval_options(rerank: bool, adaptive: bool) -> None:
+    # The adaptive cutoff needs hits in descending dense-score order, which reranking breaks
+    if rerank and adaptive:
+        raise HTTPException(status_code=400, detail="rerank and adaptive cannot be combined")
+
+
+def _overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+# Room for multipart boundaries and part headers on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = int(os.getenv("MULTIPART_OVERHEAD_BYTES", str(1024 * 1024)))
+_UPLOAD_BODY_LIMITS = {
+    "/api/upload": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    # Zip members never take much more space compressed than extracted
+    "/api/upload/batch": MAX_BATCH_BYTES + MULTIPART_OVERHEAD_BYTES,
+}
+
+
+class UploadGuardMiddleware:
+    """
+    Admission and size limits for upload requests, applied before the body is read.
+    
+    Starlette spools a multipart body to a temp file before the endpoint runs,
+    so checks in the endpoint come after the disk space and I/O are spent.
+    Here an upload waits for an upload slot first, a Content-Length over the
+    limit is rejected with 413 at once, and a body that turns out larger
+    (e.g. chunked) is cut off with 413 as soon as it passes the limit.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        limit = _UPLOAD_BODY_LIMITS.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = Request(scope).headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": f"Request body exceeds the {limit} byte limit"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > limit:
+                # FastAPI re-raises HTTPExceptions from body parsing as they are
+                raise HTTPException(status_code=413, detail=f"Request body exceeds the {limit} byte limit")
+            return message
+        
+        try:
+            async with upload_admission.admit():
+                await self.app(scope, limited_receive, send)
+        except Overloaded as e:
+            response = JSONResponse(
+                {"detail": str(e)}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+
 # Request/Response models
 class QueryRequest(BaseModel):
     question: str
     top_k: int = 5
     source_file: Optional[str] = None
+    rerank: bool = False
+    # Cuts on dense scores, so it can't be combined with rerank (400)
+    adaptive: bool = False
 
 class QueryResponse(BaseModel):
     answer: str
     sources: list[str]
     num_contexts: int
+    scores: list[float] = []
 
 class UploadResponse(BaseModel):
     filename: str
     file_id: str
     status: str
     message: str
+    size_bytes: Optional[int] = None
+    sha256: Optional[str] = None
 
 # Inngest client for sending events
 inngest_client = inngest.Inngest(app_id="rag_app", is_production=False)
 
 
+async def _send(events) -> list[str]:
+    """Send events to the configured workflow backend; returns their ids."""
+    if WORKFLOW_BACKEND == "local":
+        return await get_local_runner().send(events)
+    return await inngest_client.send(events)
+
+
+async def _wait_for_output(event_id: str, timeout_s: float) -> dict:
+    """Wait for the output of the run triggered by an event."""
+    if WORKFLOW_BACKEND == "local":
+        return await get_local_runner().wait_for_output(event_id, timeout_s=timeout_s)
+    return await InngestAPIService.wait_for_run_output(event_id, timeout_s=timeout_s)
+
+
+def _register_upload(file_id: str, filename: str, saved: SavedUpload, bulk: bool = False) -> inngest.Event:
+    """Add a saved upload to the catalog and build its ingest event."""
+    catalog = get_catalog()
+    catalog.add(
+        file_id=file_id,
+        original_name=filename,
+        stored_path=saved.path,
+        content_hash=saved.sha256,
+        size_bytes=saved.size_bytes,
+    )
+    catalog.update_progress(file_id, status="queued", stage="queued")
+    return inngest.Event(
+        name="rag/ingest_pdf",
+        data={
+            "pdf_path": str(Path(saved.path).resolve()),
+            "source_id": filename,
+            "file_id": file_id,
+            "content_hash": saved.sha256,
+            # Bulk ingest runs at lower priority than interactive uploads
+            "bulk": bulk,
+            # Small files are ingested together by the batched ingest function
+            "small": saved.size_bytes <= SMALL_PDF_MAX_BYTES,
+        },
+    )
+
+
+async def _retire_file(record: dict) -> Optional[dict]:
+    """
+    Cancel a file's ingest runs, then delete its points and catalog entry.
+    
+    Steps still running see the cancelled status and stop, removing any
+    points they upserted after the delete.
+    """
+    catalog = get_catalog()
+    file_id = record["file_id"]
+    catalog.update(file_id, status="cancelled")
+    catalog.update_progress(file_id, status="cancelled", stage="cancelled")
+    await _send(inngest.Event(name="rag/ingest_cancel", data={"file_id": file_id}))
+    await asyncio.to_thread(
+        lambda: get_storage().delete_file_points(file_id, legacy_source=record["original_name"])
+    )
+    return catalog.delete(file_id)
+
+
+async def _supersede(filename: str) -> list[str]:
+    """Retire earlier uploads of the same name; returns their file ids."""
+    retired = []
+    while (previous := get_catalog().find_by_name(filename)) is not None:
+        await _retire_file(previous)
+        retired.append(previous["file_id"])
+    return retired
+
+
 @router.post("/api/upload", response_model=UploadResponse)
 async def upload_pdf(file: UploadFile = File(...)):
     """
     Upload PDF and trigger ingestion
     """
     try:
+        # Only the final path component of the client's name is kept
+        filename = FileService.safe_filename(file.filename)
+        
         # Validate file type
-        if not file.filename.endswith('.pdf'):
+        if not filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Save file
-        uploads_dir = Path("uploads")
-        uploads_dir.mkdir(parents=True, exist_ok=True)
+        # Open the catalog before writing so a first-time import can't pick this file up
+        get_catalog()
         
         file_id = str(uuid.uuid4())
-        file_path = uploads_dir / f"{file_id}_{file.filename}"
+        file_path = FileService.upload_path(UPLOADS_DIR, file_id, filename)
+        
+        # UploadGuardMiddleware holds the upload slot for the whole request
+        # Stream file to disk in chunks
+        saved = await FileService.stream_upload(file, file_path)
         
-        # Write file
-        content = await file.read()
-        file_path.write_bytes(content)
+        # A re-upload replaces the earlier file and stops its ingest
+        await _supersede(filename)
         
         # Trigger Inngest event (using existing function)
-        await inngest_client.send(
-            inngest.Event(
-                name="rag/ingest_pdf",
-                data={
-                    "pdf_path": str(file_path.resolve()),
-                    "source_id": file.filename,
-                },
-            )
-        )
+        await _send(_register_upload(file_id, filename, saved))
         
         return UploadResponse(
-            filename=file.filename,
+            filename=filename,
             file_id=file_id,
             status="success",
-            message=f"Successfully uploaded and processing {file.filename}"
+            message=f"Successfully uploaded and processing {filename}",
+            size_bytes=saved.size_bytes,
+            sha256=saved.sha256
         )
     
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (InvalidPDFError, InvalidFilenameError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+class BatchUploadResponse(BaseModel):
+    accepted: int
+    rejected: int
+    files: list[UploadResponse]
+
+
+def _zip_pdf_members(zf: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    return [
+        info for info in zf.infolist()
+        if not info.is_dir() and Path(info.filename).name.lower().endswith(".pdf")
+    ]
+
+
+def _batch_totals(files: list[UploadFile]) -> tuple[int, int]:
     """
-    Query documents and get AI response
+    Count the PDFs of a batch request and their total size before any is saved.
+    
+    Zip members are counted from the central directory with their uncompressed
+    sizes; extraction never reads past a member's recorded size.
+    """
+    count = size = 0
+    for file in files:
+        if file.filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(file.file) as zf:
+                members = _zip_pdf_members(zf)
+            file.file.seek(0)
+            count += len(members)
+            size += sum(info.file_size for info in members)
+        else:
+            count += 1
+            size += file.size or 0
+    return count, size
+
+
+def _save_zip_members(archive, uploads_dir: Path) -> list[tuple[str, str, Optional[SavedUpload], Optional[str]]]:
+    """Extract every PDF in a zip archive, streaming each member to disk."""
+    results = []
+    with zipfile.ZipFile(archive) as zf:
+        for info in _zip_pdf_members(zf):
+            filename = Path(info.filename).name
+            file_id = str(uuid.uuid4())
+            try:
+                if info.file_size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError(f"File exceeds the {MAX_UPLOAD_BYTES} byte limit")
+                dest = FileService.upload_path(uploads_dir, file_id, filename)
+                with zf.open(info) as member:
+                    saved = FileService.write_stream(member, dest)
+                results.append((file_id, filename, saved, None))
+            except (UploadTooLargeError, InvalidPDFError, InvalidFilenameError) as e:
+                results.append((file_id, filename, None, str(e)))
+    return results
+
+
+@router.post("/api/upload/batch", response_model=BatchUploadResponse)
+async def upload_batch(files: list[UploadFile] = File(...)):
+    """
+    Upload many PDFs (or zip archives of PDFs) and trigger ingestion with one event send
     """
     try:
-        # Send query event to Inngest (using existing function)
-        result = await inngest_client.send(
-            inngest.Event(
-                name="rag/query_pdf_ai",
-                data={
-                    "question": request.question,
-                    "top_k": request.top_k,
-                    "source_file": request.source_file,
-                },
-            )
-        )
-        
-        event_id = result[0]
+        try:
+            count, size = await asyncio.to_thread(_batch_totals, files)
+        except zipfile.BadZipFile as e:
+            raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+        if count > MAX_BATCH_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+        if size > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds the {MAX_BATCH_BYTES} byte limit")
+        get_catalog()
+        semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
         
-        # Poll for results (reusing existing logic)
-        import time
-        import requests
-        import os
+        async def save(file: UploadFile):
+            async with semaphore:
+                if file.filename.lower().endswith(".zip"):
+                    return await asyncio.to_thread(_save_zip_members, file.file, UPLOADS_DIR)
+                file_id = str(uuid.uuid4())
+                try:
+                    filename = FileService.safe_filename(file.filename)
+                except InvalidFilenameError as e:
+                    return [(file_id, file.filename, None, str(e))]
+                if not filename.lower().endswith(".pdf"):
+                    return [(file_id, filename, None, "Only PDF files are allowed")]
+                try:
+                    dest = FileService.upload_path(UPLOADS_DIR, file_id, filename)
+                    saved = await FileService.stream_upload(file, dest)
+                    return [(file_id, filename, saved, None)]
+                except (UploadTooLargeError, InvalidPDFError, InvalidFilenameError) as e:
+                    return [(file_id, filename, None, str(e))]
         
-        def get_inngest_api_base():
-            return os.getenv("INNGEST_API_BASE", "http://127.0.0.1:8288/v1")
+        # UploadGuardMiddleware holds the upload slot for the whole request
+        saved_groups = await asyncio.gather(*(save(f) for f in files))
         
-        def fetch_runs(event_id: str):
-            url = f"{get_inngest_api_base()}/events/{event_id}/runs"
-            resp = requests.get(url)
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get("data", [])
+        events, responses = [], []
+        for file_id, filename, saved, error in (r for group in saved_groups for r in group):
+            if saved is None:
+                responses.append(UploadResponse(
+                    filename=filename, file_id=file_id, status="error", message=error
+                ))
+                continue
+            retired = await _supersede(filename)
+            # A later file in the same batch replaces an earlier one before its event is sent
+            events = [event for event in events if event.data["file_id"] not in retired]
+            events.append(_register_upload(file_id, filename, saved, bulk=True))
+            responses.append(UploadResponse(
+                filename=filename,
+                file_id=file_id,
+                status="success",
+                message=f"Successfully uploaded and processing {filename}",
+                size_bytes=saved.size_bytes,
+                sha256=saved.sha256
+            ))
         
-        # Wait for completion
-        timeout = 120
-        start = time.time()
-        last_status = None
+        # One batched send for the whole upload
+        if events:
+            await _send(events)
         
-        while True:
-            runs = fetch_runs(event_id)
-            if runs:
-                run = runs[0]
-                status = run.get("status")
-                last_status = status or last_status
-                
-                if status in ("Completed", "Succeeded", "Success", "Finished"):
-                    output = run.get("output") or {}
-                    return QueryResponse(
-                        answer=output.get("answer", "No answer generated"),
-                        sources=output.get("sources", []),
-                        num_contexts=output.get("num_contexts", 0)
-                    )
-                
-                if status in ("Failed", "Cancelled"):
-                    raise HTTPException(status_code=500, detail=f"Query processing {status}")
-            
-            if time.time() - start > timeout:
-                raise HTTPException(status_code=408, detail="Query timeout")
-            
-            await asyncio.sleep(0.5)
+        rejected = sum(1 for response in responses if response.status == "error")
+        return BatchUploadResponse(
+            accepted=len(responses) - rejected,
+            rejected=rejected,
+            files=responses
+        )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Identical concurrent queries share one workflow run
+_query_flight = SingleFlight()
+
+
+@router.post("/api/query", response_model=QueryResponse)
+async def query_documents(request: QueryRequest):
+    """
+    Query documents and get AI response
+    """
+    try:
+        _check_retrieval_options(request.rerank, request.adaptive)
+        key = (request.question, request.source_file, request.top_k, request.rerank, request.adaptive)
+        # Answers are shared by all workers and go stale whenever the catalog changes
+        answer_key = cache_key("query", *key, LLM_MODEL, get_catalog().version())
+        cached = get_answer(answer_key)
+        if cached is not None:
+            return QueryResponse(**cached)
+        return await _query_flight.do(key, lambda: _run_query(request, answer_key))
+    
+    except Overloaded as e:
+        raise _overloaded(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _run_query(request: QueryRequest, answer_key: str) -> QueryResponse:
+    """Send the query event, wait until its run finishes and cache the answer."""
+    # Cache hits and coalesced followers are not logged: warmup only needs to
+    # see each question once, and the write stays off the event loop
+    await asyncio.to_thread(get_shared_cache().log_query, request.question)
+    # Only the coalesced leader takes an admission slot
+    async with query_admission.admit():
+        response = await _run_query_admitted(request)
+    put_answer(answer_key, response.model_dump())
+    return response
+
+
+async def _run_query_admitted(request: QueryRequest) -> QueryResponse:
+    # Send query event to the workflow backend
+    result = await _send(
+        inngest.Event(
+            name="rag/query_pdf_ai",
+            data={
+                "question": request.question,
+                "top_k": request.top_k,
+                "source_file": request.source_file,
+                "rerank": request.rerank,
+                "adaptive": request.adaptive,
+            },
+        )
+    )
+    
+    event_id = result[0]
+    
+    # Wait for results without blocking the event loop
+    try:
+        output = await _wait_for_output(event_id, timeout_s=120)
+    except TimeoutError:
+        raise HTTPException(status_code=408, detail="Query timeout")
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Query processing failed: {e}")
+    
+    return QueryResponse(
+        answer=output.get("answer", "No answer generated"),
+        sources=output.get("sources", []),
+        num_contexts=output.get("num_contexts", 0),
+        scores=output.get("scores", [])
+    )
+
+
+def _ingest_status(file_id: str) -> Optional[dict]:
+    catalog = get_catalog()
+    record = catalog.get(file_id)
+    if record is None:
+        return None
+    progress = catalog.get_progress(file_id) or {"status": record["status"], "timings": {}}
+    progress.update(file_id=file_id, name=record["original_name"], page_count=record["page_count"])
+    
+    # Per-stage throughput from the recorded counters and timings
+    timings = progress["timings"]
+    rates = {}
+    for stage, counter in (("parse", "pages_parsed"), ("chunk", "chunks_produced"),
+                           ("embed", "chunks_embedded"), ("upsert", "points_upserted")):
+        if timings.get(stage) and progress.get(counter):
+            rates[stage] = round(progress[counter] / timings[stage], 2)
+    progress["throughput_per_s"] = rates
+    return progress
+
+
+@router.get("/api/ingest/{file_id}/status")
+async def ingest_status(file_id: str):
+    """
+    Ingestion progress of an uploaded file
+    """
+    status = _ingest_status(file_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return status
+
+
+@router.get("/api/ingest/{file_id}/events")
+async def ingest_events(file_id: str, request: Request):
+    """
+    Server-sent events stream of ingestion progress, closed once ingestion finishes
+    """
+    if _ingest_status(file_id) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    async def stream():
+        last = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            status = _ingest_status(file_id)
+            if status is None:
+                yield "event: deleted\ndata: {}\n\n"
+                return
+            payload = json.dumps(status)
+            if payload != last:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last, last_sent = payload, time.monotonic()
+                if status["status"] in TERMINAL_INGEST_STATUSES:
+                    return
+            elif time.monotonic() - last_sent > 15:
+                # Keep-alive comment so proxies don't close the stream
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class BulkQueryRequest(BaseModel):
+    questions: list[str] = Field(..., min_length=1, max_length=MAX_BULK_QUESTIONS)
+    top_k: int = 5
+    source_file: Optional[str] = None
+    rerank: bool = False
+    # Cuts on dense scores, so it can't be combined with rerank (400)
+    adaptive: bool = False
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that releases an admission slot however sending ends."""
+    
+    def __init__(self, content, slot, **kwargs):
+        super().__init__(content, **kwargs)
+        self._slot = slot
+    
+    async def __call__(self, scope, receive, send):
+        # Also covers a client that disconnects before the body iterator starts
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._slot.__aexit__(None, None, None)
+
+
+@router.post("/api/query/bulk")
+async def query_documents_bulk(request: BulkQueryRequest):
+    """
+    Answer many questions with batched retrieval; results stream back as NDJSON
+    
+    Each line is one result with the index of its question, in completion order.
+    """
+    _check_retrieval_options(request.rerank, request.adaptive)
+    try:
+        # Hold the slot for the whole stream, so enter it before returning
+        slot = bulk_admission.admit()
+        await slot.__aenter__()
+    except Overloaded as e:
+        raise _overloaded(e)
+    
+    async def stream():
+        try:
+            async for result in answer_questions(
+                request.questions, request.top_k, request.source_file,
+                use_rerank=request.rerank, adaptive=request.adaptive
+            ):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return _SlotStreamingResponse(stream(), slot, media_type="application/x-ndjson")
+
+
+@router.get("/api/metrics")
+async def metrics():
+    """Admission control metrics in Prometheus text format"""
+    return Response(
+        render_prometheus([query_admission, bulk_admission, upload_admission]),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 @router.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "RAG AI Agent API is running"}
 
 
+@router.get("/api/ready")
+async def readiness_check():
+    """
+    Readiness endpoint: 503 until startup warmup has finished
+    """
+    state = warmup.status()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
+def _format_size(file_size_bytes: int) -> str:
+    if file_size_bytes < 1024:
+        return f"{file_size_bytes} B"
+    elif file_size_bytes < 1024 * 1024:
+        return f"{file_size_bytes / 1024:.1f} KB"
+    return f"{file_size_bytes / (1024 * 1024):.1f} MB"
+
+
+def _file_info(record: dict) -> dict:
+    return {
+        "file_id": record["file_id"],
+        "name": record["original_name"],
+        "size": _format_size(record["size_bytes"]),
+        "size_bytes": record["size_bytes"],
+        "upload_date": record["uploaded_at"],
+        "path": record["stored_path"],
+        "status": record["status"],
+        "page_count": record["page_count"],
+        "chunk_count": record["chunk_count"],
+    }
+
+
 @router.get("/api/files")
-async def list_files():
+async def list_files(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = "upload_date",
+    order: str = "desc",
+    q: Optional[str] = None,
+    status: Optional[str] = None
+):
     """
-    List all uploaded PDF files with metadata
+    List uploaded PDF files with metadata
+    
+    Supports cursor pagination, sorting and filtering. Responses carry an
+    ETag derived from the catalog version, so unchanged listings get a 304.
     """
     try:
-        uploads_dir = Path("uploads")
-        if not uploads_dir.exists():
-            return {"files": []}
+        if sort not in SORT_COLUMNS or order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail="Invalid sort or order")
         
-        # Get all files with metadata
-        files = []
-        for file_path in uploads_dir.glob("*.pdf"):
-            filename = file_path.name
-            # Extract original filename (format: uuid_originalname.pdf)
-            if "_" in filename:
-                original_name = "_".join(filename.split("_")[1:])
-            else:
-                original_name = filename
-            
-            # Get file stats
-            stats = file_path.stat()
-            file_size_bytes = stats.st_size
-            
-            # Format file size
-            if file_size_bytes < 1024:
-                size_str = f"{file_size_bytes} B"
-            elif file_size_bytes < 1024 * 1024:
-                size_str = f"{file_size_bytes / 1024:.1f} KB"
-            else:
-                size_str = f"{file_size_bytes / (1024 * 1024):.1f} MB"
-            
-            # Get upload date (file creation/modification time)
-            from datetime import datetime
-            upload_date = datetime.fromtimestamp(stats.st_mtime).isoformat()
-            
-            files.append({
-                "name": original_name,
-                "size": size_str,
-                "size_bytes": file_size_bytes,
-                "upload_date": upload_date,
-                "path": str(file_path)
-            })
+        catalog = get_catalog()
+        params = json.dumps([limit, cursor, sort, order, q, status])
+        etag = f'"{catalog.version()}-{hashlib.sha1(params.encode()).hexdigest()[:16]}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
         
-        # Sort by upload date (most recent first)
-        files.sort(key=lambda x: x["upload_date"], reverse=True)
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
         
-        return {"files": files}
+        try:
+            files, next_cursor = catalog.list_page(
+                limit=limit, cursor=cursor, sort=sort, order=order,
+                name_contains=q, status=status
+            )
+        except (ValueError, binascii.Error):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        return JSONResponse(
+            {"files": [_file_info(r) for r in files], "next_cursor": next_cursor},
+            headers=headers
+        )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -210,27 +684,17 @@ async def list_files():
 @router.delete("/api/delete/{filename}")
 async def delete_file(filename: str):
     """
-    Delete a specific PDF file
+    Delete a specific PDF file (by file id or original name)
     """
     try:
-        uploads_dir = Path("uploads")
-        if not uploads_dir.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        # Find the file with the matching original name (after UUID_)
-        deleted = False
-        for file_path in uploads_dir.glob("*.pdf"):
-            if file_path.name.endswith(f"_{filename}"):
-                file_path.unlink()
-                deleted = True
-                break
-        
-        if not deleted:
+        catalog = get_catalog()
+        record = catalog.resolve(filename)
+        if record is None or await _retire_file(record) is None:
             raise HTTPException(status_code=404, detail="File not found")
         
         return {
             "status": "success",
-            "message": f"Successfully deleted {filename}"
+            "message": f"Successfully deleted {record['original_name']}"
         }
     
     except HTTPException:
@@ -247,34 +711,30 @@ class RenameRequest(BaseModel):
 @router.put("/api/rename")
 async def rename_file(request: RenameRequest):
     """
-    Rename a specific PDF file
+    Rename a specific PDF file (old_name may be a file id or original name)
     """
     try:
-        uploads_dir = Path("uploads")
-        if not uploads_dir.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-        
         # Validate new name
-        if not request.new_name.endswith('.pdf'):
+        try:
+            # Unlike uploads, a name with a directory part is rejected rather than stripped
+            if FileService.safe_filename(request.new_name) != request.new_name:
+                raise InvalidFilenameError(f"Invalid file name: {request.new_name!r}")
+        except InvalidFilenameError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not request.new_name.lower().endswith('.pdf'):
             request.new_name += '.pdf'
         
-        # Find the file with the matching original name (after UUID_)
-        renamed = False
-        for file_path in uploads_dir.glob("*.pdf"):
-            if file_path.name.endswith(f"_{request.old_name}"):
-                # Extract UUID prefix
-                uuid_prefix = file_path.name.split("_")[0]
-                new_path = uploads_dir / f"{uuid_prefix}_{request.new_name}"
-                
-                # Check if new name already exists
-                if new_path.exists():
-                    raise HTTPException(status_code=400, detail="A file with this name already exists")
-                
-                file_path.rename(new_path)
-                renamed = True
-                break
+        catalog = get_catalog()
+        record = catalog.resolve(request.old_name)
+        if record is None:
+            raise HTTPException(status_code=404, detail="File not found")
         
-        if not renamed:
+        try:
+            renamed = catalog.rename(record["file_id"], request.new_name)
+        except FileExistsError:
+            raise HTTPException(status_code=409, detail="A file with this name already exists")
+        
+        if renamed is None:
             raise HTTPException(status_code=404, detail="File not found")
         
         return {
@@ -289,28 +749,64 @@ async def rename_file(request: RenameRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/api/download/{filename}")
-async def download_file(filename: str):
+def _pdf_response(record: Optional[dict], request: Request, cache_control: str, inline: bool) -> Response:
     """
-    Download a specific PDF file
+    Serve a cataloged PDF with a strong content-hash ETag.
+    
+    Matching If-None-Match gets a 304 without opening the file. FileResponse
+    handles Range/If-Range for partial fetches and uses zero-copy sendfile
+    (http.response.pathsend) when the server supports it.
     """
+    if record is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    headers = {"Cache-Control": cache_control}
+    if record["content_hash"]:
+        headers["ETag"] = f'"{record["content_hash"]}"'
+        if_none_match = request.headers.get("if-none-match", "")
+        if headers["ETag"] in if_none_match or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    
     try:
-        uploads_dir = Path("uploads")
-        if not uploads_dir.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        # Find the file with the matching original name (after UUID_)
-        for file_path in uploads_dir.glob("*.pdf"):
-            if file_path.name.endswith(f"_{filename}"):
-                return FileResponse(
-                    path=file_path,
-                    filename=filename,
-                    media_type='application/pdf'
-                )
-        
+        stat_result = os.stat(record["stored_path"])
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     
+    return FileResponse(
+        path=record["stored_path"],
+        filename=record["original_name"],
+        media_type='application/pdf',
+        headers=headers,
+        stat_result=stat_result,
+        content_disposition_type="inline" if inline else "attachment"
+    )
+
+
+@router.get("/api/files/{file_id}/download")
+async def download_file_by_id(file_id: str, request: Request, inline: bool = False):
+    """
+    Download a PDF by file id (supports Range requests and conditional GET)
+    """
+    try:
+        # Content behind a file id never changes, so clients may cache it
+        return _pdf_response(get_catalog().get(file_id), request, "private, max-age=86400", inline)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/download/{filename}")
+async def download_file(filename: str, request: Request, inline: bool = False):
+    """
+    Download a specific PDF file (by file id or original name)
+    """
+    try:
+        # A name can point at a different upload later, so always revalidate
+        return _pdf_response(get_catalog().resolve(filename), request, "private, no-cache", inline)
+    
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,148 @@
+"""
+Local content-addressed store for ingest artifacts.
+Inngest steps exchange small references to chunk and embedding blobs kept
+here instead of serializing the data itself into step state.
+"""
+
+import os
+import time
+import zlib
+import struct
+import hashlib
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from dotenv import load_dotenv
+from custom_types import RAGArtifactRef
+
+load_dotenv()
+
+# Must be shared by every worker that runs ingest steps
+ARTIFACT_DIR = Path(os.getenv("ARTIFACT_DIR", "artifacts"))
+# Artifacts older than this are pruned after successful ingests
+ARTIFACT_TTL_S = float(os.getenv("ARTIFACT_TTL_S", str(24 * 3600)))
+
+_CHUNKS_MAGIC = b"RAGC1"
+_VECTORS_MAGIC = b"RAGV1"
+
+
+class ArtifactError(RuntimeError):
+    """Raised when an artifact is missing or does not match its hash."""
+
+
+def _path_for(content_hash: str) -> Path:
+    return ARTIFACT_DIR / content_hash[:2] / f"{content_hash}.bin"
+
+
+def _put(blob: bytes, count: int) -> RAGArtifactRef:
+    content_hash = hashlib.sha256(blob).hexdigest()
+    path = _path_for(content_hash)
+    try:
+        # A dedup hit is a new reference, so prune() must count its age from now
+        os.utime(path)
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(blob)
+        os.replace(tmp, path)
+    return RAGArtifactRef(content_hash=content_hash, path=str(path), count=count)
+
+
+def _get(ref: RAGArtifactRef) -> bytes:
+    try:
+        blob = Path(ref.path).read_bytes()
+    except FileNotFoundError:
+        raise ArtifactError(f"Artifact {ref.content_hash} not found at {ref.path}")
+    if hashlib.sha256(blob).hexdigest() != ref.content_hash:
+        raise ArtifactError(f"Artifact {ref.content_hash} is corrupt")
+    return blob
+
+
+def put_chunks(chunks: list[str]) -> RAGArtifactRef:
+    """
+    Store chunk texts as one compressed blob.
+    
+    Layout before compression: magic, chunk count, one uint32 byte length
+    per chunk, then the UTF-8 texts back to back.
+    """
+    encoded = [c.encode("utf-8") for c in chunks]
+    lengths = array("I", (len(e) for e in encoded))
+    raw = _CHUNKS_MAGIC + struct.pack("<I", len(encoded)) + lengths.tobytes() + b"".join(encoded)
+    return _put(zlib.compress(raw, 6), len(chunks))
+
+
+def get_chunks(ref: RAGArtifactRef, start: int = 0, stop: Optional[int] = None) -> list[str]:
+    """
+    Load the chunk texts behind a reference, or only chunks[start:stop].
+    
+    The blob is inflated only as far as the end of the slice, and only the
+    chunks inside it are decoded.
+    """
+    blob = _get(ref)
+    inflate = zlib.decompressobj()
+    pending = blob
+    
+    def take(size: int) -> bytes:
+        nonlocal pending
+        data = inflate.decompress(pending, size) if size else b""
+        pending = inflate.unconsumed_tail
+        if len(data) != size:
+            raise ArtifactError(f"Artifact {ref.content_hash} is truncated")
+        return data
+    
+    header = take(len(_CHUNKS_MAGIC) + 4)
+    if not header.startswith(_CHUNKS_MAGIC):
+        raise ArtifactError(f"Artifact {ref.content_hash} is not a chunk artifact")
+    (count,) = struct.unpack_from("<I", header, len(_CHUNKS_MAGIC))
+    lengths = array("I")
+    lengths.frombytes(take(4 * count))
+    start, stop, _ = slice(start, stop).indices(count)
+    # Skipped in pieces so the chunks before the slice are never held at once
+    skip = sum(lengths[:start])
+    while skip:
+        skip -= len(take(min(skip, 1 << 20)))
+    body = take(sum(lengths[start:stop]))
+    chunks = []
+    offset = 0
+    for length in lengths[start:stop]:
+        chunks.append(body[offset:offset + length].decode("utf-8"))
+        offset += length
+    return chunks
+
+
+def put_vectors(vectors: np.ndarray) -> RAGArtifactRef:
+    """Store embeddings as a row-major little-endian float32 matrix."""
+    matrix = np.ascontiguousarray(vectors, dtype="<f4")
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    rows, dim = matrix.shape
+    raw = _VECTORS_MAGIC + struct.pack("<II", rows, dim) + matrix.tobytes()
+    return _put(raw, rows)
+
+
+def get_vectors(ref: RAGArtifactRef) -> np.ndarray:
+    """Load the embeddings behind a reference as a read-only (rows, dim) float32 matrix."""
+    raw = _get(ref)
+    if not raw.startswith(_VECTORS_MAGIC):
+        raise ArtifactError(f"Artifact {ref.content_hash} is not a vector artifact")
+    rows, dim = struct.unpack_from("<II", raw, len(_VECTORS_MAGIC))
+    return np.frombuffer(raw, dtype="<f4", count=rows * dim, offset=len(_VECTORS_MAGIC) + 8).reshape(rows, dim)
+
+
+def prune(max_age_s: float = ARTIFACT_TTL_S) -> int:
+    """Delete artifacts not stored or reused for max_age_s seconds; returns how many were removed."""
+    if not ARTIFACT_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for path in ARTIFACT_DIR.glob("*/*.bin"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
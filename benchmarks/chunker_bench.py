@@ -0,0 +1,123 @@
+"""
+Throughput and output parity of chunker.py against llama-index's SentenceSplitter.
+
+Chunks the same pages with SentenceSplitter(chunk_size=1000, chunk_overlap=200),
+with chunker.chunk_texts in-process and with its worker-process pool, and
+reports chunks/sec for each. Parity is measured against SentenceSplitter:
+
+  identical  share of its chunks that chunker produced verbatim
+  count      chunk count relative to SentenceSplitter
+  max tokens largest chunk, which must stay within chunk_size
+
+Pages come from the given PDFs, or are generated when none are passed.
+Exits non-zero when identical falls below --min-parity or a chunk is too big.
+
+Usage:
+    python benchmarks/chunker_bench.py [--pdf a.pdf ...] [--pages 400] [--repeat 3] [--min-parity 0.8]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import chunker  # noqa: E402
+from data_loader import load_pdf_pages  # noqa: E402
+
+_WORDS = (
+    "the of and to in is that for it as was with be by on not he this are or his from at which but have an "
+    "they you were her she there been one all we their has would when if so no will more can its out some "
+    "model data system results method value table figure section analysis training document query vector"
+).split()
+
+
+def make_pages(count: int, seed: int = 0) -> list[str]:
+    """Prose-like pages of a few hundred to ~1500 words with paragraphs, numbers and abbreviations."""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        paragraphs = []
+        for _ in range(rng.randint(3, 10)):
+            sentences = []
+            for _ in range(rng.randint(3, 9)):
+                words = rng.choices(_WORDS, k=rng.randint(6, 28))
+                if rng.random() < 0.2:
+                    words.insert(rng.randrange(1, len(words)), rng.choice(["e.g.", "Dr. Smith", "Fig. 3", "approx."]))
+                if rng.random() < 0.3:
+                    words.insert(rng.randrange(len(words)), f"{rng.uniform(0, 100):.2f},")
+                words[0] = words[0].capitalize()
+                sentences.append(" ".join(words) + rng.choice([".", ".", ".", "?", "!"]))
+            paragraphs.append(" ".join(sentences))
+        pages.append(rng.choice(["\n\n", "\n\n\n"]).join(paragraphs))
+    return pages
+
+
+def time_it(fn, repeat: int) -> tuple[float, list[str]]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), chunks
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pdf", nargs="*", default=[])
+    parser.add_argument("--pages", type=int, default=400, help="generated pages when no PDF is given")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-parity", type=float, default=0.8)
+    args = parser.parse_args()
+
+    pages = [page for path in args.pdf for page in load_pdf_pages(path)] or make_pages(args.pages)
+    pages = [page for page in pages if page]
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / 2**20:.1f} MiB of text, "
+          f"chunk_size={chunker.CHUNK_SIZE} overlap={chunker.CHUNK_OVERLAP}, {chunker.CHUNKER_WORKERS} workers")
+
+    from llama_index.core.node_parser import SentenceSplitter
+    splitter = SentenceSplitter(chunk_size=chunker.CHUNK_SIZE, chunk_overlap=chunker.CHUNK_OVERLAP)
+    # Load the tokenizers and the punkt model, and start the pool, before timing
+    splitter.split_text(pages[0])
+    chunker.chunk_texts(pages[:2])
+    if chunker.CHUNKER_WORKERS > 1:
+        chunker.chunk_texts(pages[:2] * chunker.CHUNKER_WORKERS, parallel=True)
+
+    def baseline():
+        return [chunk for page in pages for chunk in splitter.split_text(page)]
+
+    def fast():
+        # Cleared so repeats don't measure a warm token-length cache
+        chunker.token_len.cache_clear()
+        return chunker.chunk_texts(pages, parallel=False)
+
+    runs = {"SentenceSplitter": (baseline, args.repeat), "chunker": (fast, args.repeat)}
+    if chunker.CHUNKER_WORKERS > 1:
+        # Timed once: the workers' token-length caches stay warm between runs
+        runs["chunker (processes)"] = (lambda: chunker.chunk_texts(pages, parallel=True), 1)
+
+    results = {name: time_it(fn, repeat) for name, (fn, repeat) in runs.items()}
+    base_seconds, expected = results["SentenceSplitter"]
+    for name, (seconds, chunks) in results.items():
+        print(f"  {name:20s} {seconds * 1000:9.1f} ms {len(chunks) / seconds:10.0f} chunks/s  {base_seconds / seconds:5.1f}x")
+
+    chunks = results["chunker"][1]
+    if results.get("chunker (processes)", (0, chunks))[1] != chunks:
+        print("process pool output differs from in-process output")
+        return 1
+    identical = sum((Counter(expected) & Counter(chunks)).values()) / max(len(expected), 1)
+    max_tokens = max(map(chunker.token_len, chunks), default=0)
+    print(f"parity: identical {identical:.1%}, count {len(chunks)}/{len(expected)}, "
+          f"max tokens {max_tokens} (SentenceSplitter {max(map(chunker.token_len, expected), default=0)})")
+    if identical < args.min_parity or max_tokens > chunker.CHUNK_SIZE:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
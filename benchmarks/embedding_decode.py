@@ -0,0 +1,103 @@
+"""
+Decode cost of an embeddings API response.
+
+Builds synthetic /embeddings response bodies and times three ways of turning
+them into a float32 matrix:
+
+  float          encoding_format="float": JSON float arrays, then np.array
+  sdk-default    what the SDK does when encoding_format is omitted: base64 on
+                 the wire, decoded back into Python float lists
+  base64         encoding_format="base64" decoded with np.frombuffer (embed_text)
+
+Reports the median wall time and the tracemalloc peak of each.
+
+Usage:
+    python benchmarks/embedding_decode.py [--rows 128] [--dim 3072] [--repeat 20]
+"""
+
+import argparse
+import base64
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def make_bodies(rows: int, dim: int) -> tuple[bytes, bytes]:
+    matrix = np.random.default_rng(0).standard_normal((rows, dim), dtype=np.float32)
+    float_body = {
+        "object": "list",
+        "data": [{"object": "embedding", "index": i, "embedding": row.tolist()} for i, row in enumerate(matrix)],
+    }
+    base64_body = {
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": i, "embedding": base64.b64encode(row.astype("<f4").tobytes()).decode()}
+            for i, row in enumerate(matrix)
+        ],
+    }
+    return json.dumps(float_body).encode(), json.dumps(base64_body).encode()
+
+
+def decode_float(body: bytes, dim: int) -> np.ndarray:
+    data = json.loads(body)["data"]
+    return np.array([item["embedding"] for item in data], dtype=np.float32)
+
+
+def decode_sdk_default(body: bytes, dim: int) -> np.ndarray:
+    data = json.loads(body)["data"]
+    for item in data:
+        item["embedding"] = np.frombuffer(base64.b64decode(item["embedding"]), dtype="float32").tolist()
+    return np.array([item["embedding"] for item in data], dtype=np.float32)
+
+
+def decode_base64(body: bytes, dim: int) -> np.ndarray:
+    data = json.loads(body)["data"]
+    vectors = np.empty((len(data), dim), dtype=np.float32)
+    for item in data:
+        vectors[item["index"]] = np.frombuffer(base64.b64decode(item["embedding"]), dtype="<f4")
+    return vectors
+
+
+def measure(fn, body: bytes, dim: int, repeat: int) -> tuple[float, int]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(body, dim)
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(body, dim)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=128)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    float_body, base64_body = make_bodies(args.rows, args.dim)
+    expected = decode_float(float_body, args.dim)
+    assert np.array_equal(decode_base64(base64_body, args.dim), expected)
+
+    print(f"{args.rows} x {args.dim} embeddings; body {len(float_body) / 2**20:.1f} MiB as floats, "
+          f"{len(base64_body) / 2**20:.1f} MiB as base64")
+    results = {
+        "float": measure(decode_float, float_body, args.dim, args.repeat),
+        "sdk-default": measure(decode_sdk_default, base64_body, args.dim, args.repeat),
+        "base64": measure(decode_base64, base64_body, args.dim, args.repeat),
+    }
+    baseline = results["float"][0]
+    for name, (seconds, peak) in results.items():
+        print(f"  {name:12s} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x  peak {peak / 2**20:7.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
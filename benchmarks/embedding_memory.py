@@ -0,0 +1,75 @@
+"""
+Peak memory of holding one document's embeddings during ingest.
+
+Compares the old representation (list[list[float]] plus a PointStruct per
+chunk for the upsert request) with a float32 NumPy matrix uploaded a batch at
+a time, measured with tracemalloc. Exits non-zero when the reduction is
+below the target.
+
+Usage:
+    python benchmarks/embedding_memory.py [--chunks 10000] [--dim 3072] [--target 5]
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_db import UPSERT_BATCH_SIZE
+
+
+def _peak(fn) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def list_path(source: np.ndarray, ids: list[str], payloads: list[dict]) -> None:
+    from qdrant_client.models import PointStruct
+    vectors = [row.tolist() for row in source]
+    points = [PointStruct(id=ids[i], vector=vectors[i], payload=payloads[i]) for i in range(len(ids))]
+    del points
+
+
+def numpy_path(source: np.ndarray, ids: list[str], payloads: list[dict]) -> None:
+    vectors = np.array(source, dtype=np.float32)
+    # upload_collection converts one batch of rows per request
+    for start in range(0, len(vectors), UPSERT_BATCH_SIZE):
+        batch = vectors[start:start + UPSERT_BATCH_SIZE].tolist()
+        del batch
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--target", type=float, default=5.0)
+    args = parser.parse_args()
+
+    source = np.random.default_rng(0).random((args.chunks, args.dim), dtype=np.float32)
+    ids = [str(uuid.uuid4()) for _ in range(args.chunks)]
+    payloads = [{"text": "", "source": "bench.pdf"} for _ in range(args.chunks)]
+
+    lists = _peak(lambda: list_path(source, ids, payloads))
+    arrays = _peak(lambda: numpy_path(source, ids, payloads))
+    ratio = lists / arrays
+
+    print(f"{args.chunks} x {args.dim} embeddings")
+    print(f"  list[list[float]] + PointStruct: {lists / 2**20:9.1f} MiB peak")
+    print(f"  float32 ndarray, batched upload: {arrays / 2**20:9.1f} MiB peak")
+    print(f"  reduction: {ratio:.1f}x (target {args.target:.0f}x)")
+    return 0 if ratio >= args.target else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
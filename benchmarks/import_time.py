@@ -0,0 +1,88 @@
+"""
+Import-time benchmark for the API entry point.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters and reports
+the cumulative import time of the slowest top-level modules. Exits non-zero
+when the median total exceeds the budget or when a module that should load
+lazily was imported at startup.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--budget-ms 1500] [--top 15]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cold-start budget for `import main`, in milliseconds
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+# Heavy dependencies that must only be imported on first use
+LAZY_MODULES = ("llama_index", "openai", "qdrant_client", "pypdf", "tiktoken")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str = "main") -> list[tuple[str, int, int]]:
+    """Import a module in a fresh interpreter; returns (name, depth, cumulative_us) rows."""
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "PYTHONDONTWRITEBYTECODE": "1"}
+    # Importing main must not need credentials
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            rows.append((name, (len(indent) - 1) // 2, int(cumulative)))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        rows = measure(args.module)
+        # Top-level entries sum to the whole startup cost
+        totals.append(sum(us for _, depth, us in rows if depth == 0) / 1000)
+    total_ms = statistics.median(totals)
+
+    print(f"import {args.module}: median {total_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("\nSlowest imports (cumulative, last run):")
+    for name, depth, us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+    imported = {name.split(".")[0] for name, _, _ in rows}
+    eager = [name for name in LAZY_MODULES if name in imported]
+
+    failed = False
+    if eager:
+        print(f"\nFAIL: imported at startup but should load lazily: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\nFAIL: {total_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("\nOK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Throughput and memory per worker for the multi-process serving mode.
+
+Starts `gunicorn -c gunicorn.conf.py main:app` with 1, 2, 4, ... workers,
+drives an endpoint with concurrent keep-alive clients for a fixed time and
+reads each process's memory from /proc (Linux only):
+
+  RSS  resident set, counting pages shared with the master
+  PSS  shared pages split evenly between the processes using them
+  USS  pages private to the process; what one more worker actually costs
+
+With preload_app the imported code and its data are shared copy-on-write, so
+USS per worker stays well below RSS. Pick WEB_CONCURRENCY so that
+master RSS + workers x USS fits the instance memory, and so that the next
+doubling no longer raises requests/s.
+
+Usage:
+    python benchmarks/workers.py [--workers 1 2 4] [--path /api/files] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _memory_kib(pid: int) -> dict[str, int]:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fp:
+        for line in fp:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as fp:
+        return [int(child) for child in fp.read().split()]
+
+
+async def _load(url: str, seconds: float, concurrency: int) -> tuple[int, int]:
+    ok = failed = 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal ok, failed
+            while time.perf_counter() < deadline:
+                try:
+                    response = await client.get(url)
+                    if response.status_code < 500:
+                        ok += 1
+                    else:
+                        failed += 1
+                except httpx.HTTPError:
+                    failed += 1
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return ok, failed
+
+
+def run(workers: int, path: str, seconds: float, concurrency: int) -> dict:
+    port = _free_port()
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(port)}
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        for _ in range(300):
+            try:
+                if httpx.get(f"{base}/api/health", timeout=1).status_code == 200 and len(_children(master.pid)) == workers:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        else:
+            raise RuntimeError(f"gunicorn with {workers} workers did not start")
+
+        ok, failed = asyncio.run(_load(base + path, seconds, concurrency))
+        worker_memory = [_memory_kib(pid) for pid in _children(master.pid)]
+        return {
+            "workers": workers,
+            "rps": ok / seconds,
+            "failed": failed,
+            "master_rss": _memory_kib(master.pid)["rss"],
+            "rss": max(m["rss"] for m in worker_memory),
+            "pss": max(m["pss"] for m in worker_memory),
+            "uss": max(m["uss"] for m in worker_memory),
+        }
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/api/files")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"GET {args.path}, {args.concurrency} clients, {args.seconds:.0f} s per run, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'req/s':>9} {'failed':>7} {'master RSS':>11} {'worker RSS':>11} {'PSS':>8} {'USS':>8}")
+    for workers in args.workers:
+        r = run(workers, args.path, args.seconds, args.concurrency)
+        print(f"{r['workers']:>7} {r['rps']:>9.0f} {r['failed']:>7} {r['master_rss'] / 1024:>9.0f}MB "
+              f"{r['rss'] / 1024:>9.0f}MB {r['pss'] / 1024:>6.0f}MB {r['uss'] / 1024:>6.0f}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
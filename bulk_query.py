@@ -0,0 +1,109 @@
+"""
+Bulk question answering.
+Embeds all questions in batched calls, retrieves with one batched Qdrant
+request and runs the LLM calls with bounded concurrency.
+"""
+
+import asyncio
+import os
+from typing import AsyncIterator, Optional
+from dotenv import load_dotenv
+from data_loader import embed_queries
+from vector_db import QdrantStorage, get_storage, adaptive_cutoff, ADAPTIVE_MAX_K
+from reranker import rerank, RERANK_CANDIDATES
+from prompts import LLM_MODEL, build_chat_body, llm_client
+
+load_dotenv()
+
+BULK_LLM_CONCURRENCY = int(os.getenv("BULK_LLM_CONCURRENCY", "8"))
+
+def _select_hits(question: str, hits: list[dict], top_k: int, use_rerank: bool, adaptive: bool) -> list[dict]:
+    if use_rerank:
+        return rerank(question, hits, top_k)
+    if adaptive:
+        return adaptive_cutoff(hits, max_k=min(top_k, ADAPTIVE_MAX_K))
+    return hits[:top_k]
+
+
+def retrieve_many(
+    questions: list[str],
+    top_k: int = 5,
+    source_file: Optional[str] = None,
+    use_rerank: bool = False,
+    adaptive: bool = False
+) -> list[dict]:
+    """
+    Embed and search all questions with batched calls.
+    
+    Returns:
+        One contexts/sources/scores dict per question, in input order
+        
+    Raises:
+        ValueError: If use_rerank and adaptive are both set; the adaptive
+            cutoff needs hits in descending dense-score order
+    """
+    if use_rerank and adaptive:
+        raise ValueError("rerank and adaptive cannot be combined")
+    # Batched, and shared with every worker through the query-embedding cache
+    vectors = embed_queries(questions)
+    
+    limit = max(top_k, RERANK_CANDIDATES) if use_rerank else top_k
+    hit_lists = get_storage().search_many(vectors, limit, source_filter=source_file)
+    return [
+        QdrantStorage.to_result(_select_hits(q, hits, top_k, use_rerank, adaptive))
+        for q, hits in zip(questions, hit_lists)
+    ]
+
+
+async def answer_questions(
+    questions: list[str],
+    top_k: int = 5,
+    source_file: Optional[str] = None,
+    use_rerank: bool = False,
+    adaptive: bool = False,
+    concurrency: int = BULK_LLM_CONCURRENCY
+) -> AsyncIterator[dict]:
+    """
+    Answer many questions, yielding each result as soon as it is ready.
+    
+    Args:
+        questions: Questions to answer
+        top_k: Number of chunks to retrieve per question
+        source_file: Optional source filter shared by all questions
+        use_rerank: Rerank an over-fetched candidate pool
+        adaptive: Use the adaptive top_k cutoff
+        concurrency: Maximum number of concurrent LLM calls
+        
+    Yields:
+        Result dicts with the question index; failed questions carry an error
+    """
+    found = await asyncio.to_thread(retrieve_many, questions, top_k, source_file, use_rerank, adaptive)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def answer(index: int) -> dict:
+        question, result = questions[index], found[index]
+        async with semaphore:
+            try:
+                res = await llm_client().chat.completions.create(
+                    model=LLM_MODEL, **build_chat_body(question, result["contexts"])
+                )
+                answer = res.choices[0].message.content.strip()
+            except Exception as e:
+                return {"index": index, "question": question, "error": str(e)}
+        return {
+            "index": index,
+            "question": question,
+            "answer": answer,
+            "sources": result["sources"],
+            "num_contexts": len(result["contexts"]),
+            "scores": result["scores"],
+        }
+    
+    tasks = [asyncio.ensure_future(answer(i)) for i in range(len(questions))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: stop the remaining LLM calls
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,221 @@
+"""
+Sentence-preferring text chunker used on the ingest hot path.
+
+Keeps the semantics of llama-index's SentenceSplitter(chunk_size=1000,
+chunk_overlap=200): text is split by paragraph, then by sentence, then by
+phrase, word and character until every piece fits chunk_size tokens, and the
+pieces are merged greedily into chunks that carry up to chunk_overlap tokens of
+the previous chunk. It differs in how the work is done:
+
+- sentences come from one regex pass instead of the NLTK punkt tokenizer,
+  following the same rules on the text PDFs produce
+- token counts go through a cached function, so text that is split further
+  and repeated headers or footers are not tokenized again
+- chunks are built as lists of pieces and joined once
+- large inputs are chunked page by page in a pool of worker processes
+"""
+
+import os
+import re
+from functools import cache, lru_cache
+from typing import NamedTuple, Optional
+from dotenv import load_dotenv
+from fork_safe import fork_safe_cache
+
+load_dotenv()
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Same encoding SentenceSplitter counts tokens with
+CHUNK_ENCODING = os.getenv("CHUNK_ENCODING", "cl100k_base")
+# Inputs with at least this many characters are chunked in worker processes
+CHUNKER_PARALLEL_MIN_CHARS = int(os.getenv("CHUNKER_PARALLEL_MIN_CHARS", "500000"))
+# Worker processes for large inputs; 0 or 1 keeps chunking in-process
+CHUNKER_WORKERS = int(os.getenv("CHUNKER_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+PARAGRAPH_SEP = "\n\n\n"
+# SentenceSplitter's fallback for sentences longer than a chunk
+_PHRASE = re.compile(r"[^,.;。？！]+[,.;。？！]?|[,.;。？！]")
+# Sentence end as the punkt model SentenceSplitter uses sees it: terminal
+# punctuation and closing quotes followed by whitespace, except after an
+# initial such as "J. Smith". CJK text falls through to _PHRASE, as there
+_SENTENCE_END = re.compile(r"(?<!(?<![^\s(\[\"'“‘])[^\W\d_])[.!?]+[\"'”’)\]]*\s+")
+
+
+class _Split(NamedTuple):
+    text: str
+    is_sentence: bool
+    tokens: int
+
+
+@cache
+def _encoding():
+    import tiktoken
+    if "TIKTOKEN_CACHE_DIR" not in os.environ:
+        # llama-index ships the BPE files, so no download is needed offline
+        from importlib.util import find_spec
+        spec = find_spec("llama_index.core")
+        if spec and spec.origin:
+            static = os.path.join(os.path.dirname(spec.origin), "_static", "tiktoken_cache")
+            if os.path.isdir(static):
+                os.environ["TIKTOKEN_CACHE_DIR"] = static
+    return tiktoken.get_encoding(CHUNK_ENCODING)
+
+
+@lru_cache(maxsize=8192)
+def token_len(text: str) -> int:
+    """Token count of a piece of text; repeated headers and footers hit the cache."""
+    if "<|" in text:
+        # SentenceSplitter counts special tokens such as <|endoftext|> as one token
+        return len(_encoding().encode(text, allowed_special="all"))
+    # Skips the special-token scan on the common path
+    return len(_encoding().encode_ordinary(text))
+
+
+def _split_keep(text: str, sep: str) -> list[str]:
+    # Separator stays at the start of the following piece, as in SentenceSplitter
+    parts = text.split(sep)
+    return [piece for piece in [parts[0], *(sep + part for part in parts[1:])] if piece]
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split text into sentences, each keeping its trailing whitespace."""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+        if end < len(text):
+            sentences.append(text[start:end])
+            start = end
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+
+def _split_once(text: str) -> tuple[list[str], bool]:
+    # Coarsest level that breaks the text up, and whether its pieces are sentences
+    for split_fn in (lambda t: _split_keep(t, PARAGRAPH_SEP), split_sentences):
+        pieces = split_fn(text)
+        if len(pieces) > 1:
+            return pieces, True
+    for split_fn in (_PHRASE.findall, lambda t: _split_keep(t, " "), list):
+        pieces = split_fn(text)
+        if len(pieces) > 1:
+            break
+    return pieces, False
+
+
+def _split(text: str, chunk_size: int) -> list[_Split]:
+    tokens = token_len(text)
+    if tokens <= chunk_size:
+        return [_Split(text, True, tokens)]
+    pieces, is_sentence = _split_once(text)
+    splits = []
+    for piece in pieces:
+        tokens = token_len(piece)
+        if tokens <= chunk_size or len(pieces) == 1:
+            # An indivisible piece over the limit is rejected by _merge
+            splits.append(_Split(piece, is_sentence, tokens))
+        else:
+            # Its token count is cached, so recursing doesn't tokenize it again
+            splits.extend(_split(piece, chunk_size))
+    return splits
+
+
+def _merge(splits: list[_Split], chunk_size: int, chunk_overlap: int) -> list[str]:
+    chunks = []
+    current: list[_Split] = []
+    current_tokens = 0
+    new_chunk = True
+
+    def close_chunk():
+        nonlocal current, current_tokens, new_chunk
+        chunks.append("".join(split.text for split in current))
+        # Carry whole trailing pieces of the closed chunk over as overlap
+        overlap_start = len(current)
+        overlap_tokens = 0
+        while overlap_start > 0 and overlap_tokens + current[overlap_start - 1].tokens <= chunk_overlap:
+            overlap_start -= 1
+            overlap_tokens += current[overlap_start].tokens
+        current = current[overlap_start:]
+        current_tokens = overlap_tokens
+        new_chunk = True
+
+    i = 0
+    while i < len(splits):
+        split = splits[i]
+        if split.tokens > chunk_size:
+            raise ValueError("Single token exceeded chunk size")
+        if current_tokens + split.tokens > chunk_size and not new_chunk:
+            close_chunk()
+            continue
+        if new_chunk and current_tokens + split.tokens > chunk_size:
+            # Drop overlap from the front until the piece fits
+            drop = 0
+            while drop < len(current) and current_tokens + split.tokens > chunk_size:
+                current_tokens -= current[drop].tokens
+                drop += 1
+            current = current[drop:]
+        if split.is_sentence or current_tokens + split.tokens <= chunk_size or new_chunk:
+            current.append(split)
+            current_tokens += split.tokens
+            new_chunk = False
+            i += 1
+        else:
+            close_chunk()
+    if not new_chunk:
+        chunks.append("".join(split.text for split in current))
+    return [stripped for stripped in (chunk.strip() for chunk in chunks) if stripped]
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """
+    Split text into chunks of at most chunk_size tokens.
+
+    Args:
+        text: Text to split, e.g. one PDF page.
+        chunk_size: Token budget per chunk.
+        chunk_overlap: Tokens of the previous chunk repeated at the start of the next.
+
+    Returns:
+        Stripped, non-empty chunks in document order.
+    """
+    if chunk_overlap > chunk_size:
+        raise ValueError(f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})")
+    if not text or text.isspace():
+        return []
+    return _merge(_split(text, chunk_size), chunk_size, chunk_overlap)
+
+
+@fork_safe_cache
+def _get_pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    # spawn: forking a process that runs threads and an event loop is unsafe
+    return ProcessPoolExecutor(CHUNKER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def chunk_texts(texts: list[str], parallel: Optional[bool] = None) -> list[str]:
+    """
+    Chunk several texts (e.g. the pages of a PDF) in order.
+
+    Args:
+        texts: Texts to chunk; empty ones are skipped.
+        parallel: Use worker processes; by default only for inputs of at
+            least CHUNKER_PARALLEL_MIN_CHARS characters.
+
+    Returns:
+        The chunks of every text, concatenated.
+    """
+    texts = [text for text in texts if text]
+    if parallel is None:
+        parallel = CHUNKER_WORKERS > 1 and len(texts) > 1 and sum(map(len, texts)) >= CHUNKER_PARALLEL_MIN_CHARS
+    chunks = []
+    if parallel:
+        batch = max(1, len(texts) // (CHUNKER_WORKERS * 4))
+        for text_chunks in _get_pool().map(chunk_text, texts, chunksize=batch):
+            chunks.extend(text_chunks)
+    else:
+        for text in texts:
+            chunks.extend(chunk_text(text))
+    return chunks
@@ -0,0 +1,151 @@
+"""
+Concurrency helpers for the API layer.
+Coalesces identical in-flight requests and bounds how much work runs at once.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Run at most one computation per key; concurrent callers share its result."""
+    
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+    
+    def __len__(self) -> int:
+        return len(self._inflight)
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await the in-flight computation for key, starting it if there is none.
+        
+        The computation runs as its own task, so a caller that disconnects
+        does not cancel it for the others still waiting.
+        
+        Args:
+            key: Identity of the request
+            fn: Coroutine factory that computes the result
+            
+        Returns:
+            The shared result (exceptions are shared too)
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+
+class Overloaded(Exception):
+    """Raised when a request is turned away by admission control."""
+    
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue.
+    
+    Requests beyond max_concurrent wait in a FIFO queue of at most max_queue
+    entries. A full queue is rejected immediately with 429; a request that
+    waits longer than queue_timeout_s is rejected with 503.
+    """
+    
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout_s: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.admitted_total = 0
+        self.rejected_total = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.service_seconds_total = 0.0
+    
+    def _retry_after(self) -> int:
+        # Rough time for the current queue to drain
+        completed = self.admitted_total - self.active
+        avg_service = self.service_seconds_total / completed if completed else 1.0
+        return max(1, math.ceil(avg_service * (self.waiting + 1) / self.max_concurrent))
+    
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        Hold one concurrency slot for the duration of the block.
+        
+        Raises:
+            Overloaded: If the queue is full or the wait times out
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected_total["queue_full"] += 1
+            raise Overloaded(429, self._retry_after(), f"{self.name} queue is full")
+        
+        self.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self.rejected_total["timeout"] += 1
+            raise Overloaded(503, self._retry_after(), f"Timed out waiting for a {self.name} slot")
+        finally:
+            self.waiting -= 1
+        
+        waited = time.monotonic() - queued_at
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.admitted_total += 1
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.service_seconds_total += time.monotonic() - started
+            self._semaphore.release()
+    
+    def metrics(self) -> dict:
+        """Current queue depth, wait time and rejection counters."""
+        return {
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted_total": self.admitted_total,
+            "rejected_queue_full_total": self.rejected_total["queue_full"],
+            "rejected_timeout_total": self.rejected_total["timeout"],
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+def render_prometheus(controllers: list[AdmissionController]) -> str:
+    """Render admission metrics in the Prometheus text exposition format."""
+    lines = []
+    names = list(controllers[0].metrics()) if controllers else []
+    for metric in names:
+        kind = "counter" if metric.endswith("_total") else "gauge"
+        lines.append(f"# TYPE rag_admission_{metric} {kind}")
+        for controller in controllers:
+            value = controller.metrics()[metric]
+            lines.append(f'rag_admission_{metric}{{lane="{controller.name}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -5,6 +5,26 @@ class RAGchunckandsrc(pydantic.BaseModel):
     Source_id: str = None
 
 
+class RAGArtifactRef(pydantic.BaseModel):
+    content_hash: str
+    path: str
+    count: int
+
+
+class RAGChunkRef(pydantic.BaseModel):
+    Chunks: RAGArtifactRef
+    Source_id: str = None
+
+
+class RAGBatchDoc(pydantic.BaseModel):
+    file_id: str = None
+    chunk_ref: RAGChunkRef
+
+
+class RAGBatchChunks(pydantic.BaseModel):
+    docs: list[RAGBatchDoc]
+
+
 class RAGUpsertResult(pydantic.BaseModel):
     ingested: int
     
@@ -12,8 +32,16 @@ class RAGUpsertResult(pydantic.BaseModel):
 class RAGSearchResult(pydantic.BaseModel):
     contexts: list[str]
     sources: list[str]
+    scores: list[float] = []
     
 class RAGQueryResult(pydantic.BaseModel):
     answer: str
     num_contexts: int
-    sources: list[str]
\ No newline at end of file
+    sources: list[str]
+    scores: list[float] = []
+
+
+class SavedUpload(pydantic.BaseModel):
+    path: str
+    size_bytes: int
+    sha256: str
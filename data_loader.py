@@ -1,32 +1,82 @@
-from openai import OpenAI
-from llama_index.readers.file import PDFReader
-from llama_index.core.node_parser import SentenceSplitter
 from dotenv import load_dotenv
+from functools import cache
+import base64
+import numpy as np
+import os
+import chunker
+from fork_safe import fork_safe_cache
 
+# openai, pypdf and llama_index are imported on first use: together they take
+# seconds to import, which would otherwise delay every cold start
 
 load_dotenv()
 
-client = OpenAI()
 EMBED_MODEL = "text-embedding-3-large"
 EMBED_DIM = 3072
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+# "regex" (chunker.py) or "sentence_splitter" (llama-index); both give the same chunk sizes and overlap
+CHUNKER = os.getenv("CHUNKER", "regex")
 
-splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=200)
+@fork_safe_cache
+def get_client():
+    from openai import OpenAI
+    return OpenAI()
 
-def load_and_chunk_pdf(path: str):
-    docs = PDFReader().load_data(file=path)
-    texts =[ d.text for d in docs if getattr(d, 'text', None)]
+@cache
+def get_splitter():
+    from llama_index.core.node_parser import SentenceSplitter
+    return SentenceSplitter(chunk_size=chunker.CHUNK_SIZE, chunk_overlap=chunker.CHUNK_OVERLAP)
+
+def count_pdf_pages(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+def load_pdf_pages(path: str, page_start: int = 0, page_end: int = None) -> list[str]:
+    from pypdf import PdfReader
+    # Only the requested page range is parsed
+    pages = PdfReader(path).pages
+    page_end = len(pages) if page_end is None else min(page_end, len(pages))
+    return [pages[i].extract_text() or "" for i in range(page_start, page_end)]
+
+def chunk_texts(texts: list[str]) -> list[str]:
+    if CHUNKER == "regex":
+        return chunker.chunk_texts(texts)
+    splitter = get_splitter()
     chunks = []
     for t in texts:
-        chunks.extend(splitter.split_text(t))
+        if t:
+            chunks.extend(splitter.split_text(t))
     return chunks
 
-def embed_text(text: list [str]) -> list [list [float]]:
-    response = client.embeddings.create(
+def load_and_chunk_pdf(path: str):
+    return chunk_texts(load_pdf_pages(path))
+
+def embed_queries(questions: list[str]) -> np.ndarray:
+    # Query embeddings are cached across workers; only misses go to the API
+    from shared_cache import get_query_embeddings, put_query_embeddings
+    found = get_query_embeddings(EMBED_MODEL, questions)
+    missing = list(dict.fromkeys(q for q in questions if q not in found))
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = missing[start:start + EMBED_BATCH_SIZE]
+        vectors = embed_text(batch)
+        put_query_embeddings(EMBED_MODEL, batch, vectors)
+        found.update(zip(batch, vectors))
+    if not questions:
+        return np.empty((0, EMBED_DIM), dtype=np.float32)
+    return np.stack([found[q] for q in questions])
+
+def embed_text(text: list [str]) -> np.ndarray:
+    response = get_client().embeddings.create(
         model = EMBED_MODEL,
         input = text,
-        
+        # Raw little-endian float32 bytes, so no JSON floats are parsed
+        encoding_format = "base64",
     )    
-    return [item.embedding for item in response.data]
+    # One contiguous float32 row per input instead of lists of boxed floats
+    vectors = np.empty((len(response.data), EMBED_DIM), dtype=np.float32)
+    for item in response.data:
+        vectors[item.index] = np.frombuffer(base64.b64decode(item.embedding), dtype="<f4")
+    return vectors
 
 
     
\ No newline at end of file
@@ -0,0 +1,469 @@
+"""
+Persistent catalog of uploaded files.
+Keeps per-file metadata in SQLite so file endpoints never scan the uploads directory.
+"""
+
+import os
+import json
+import base64
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from dotenv import load_dotenv
+from fork_safe import fork_safe_cache
+
+load_dotenv()
+
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR", "uploads"))
+CATALOG_PATH = Path(os.getenv("FILE_CATALOG_PATH", str(UPLOADS_DIR / "catalog.sqlite3")))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    original_name TEXT NOT NULL,
+    stored_path TEXT NOT NULL,
+    content_hash TEXT,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    page_count INTEGER,
+    chunk_count INTEGER,
+    status TEXT NOT NULL DEFAULT 'processing',
+    uploaded_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files(original_name, uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_files_uploaded ON files(uploaded_at, file_id);
+CREATE INDEX IF NOT EXISTS idx_files_size ON files(size_bytes, file_id);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS ingest_progress (
+    file_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    pages_parsed INTEGER NOT NULL DEFAULT 0,
+    chunks_produced INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    points_upserted INTEGER NOT NULL DEFAULT 0,
+    timings TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    started_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS ingest_parts (
+    file_id TEXT NOT NULL,
+    part INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    pages_parsed INTEGER NOT NULL DEFAULT 0,
+    chunks_produced INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    points_upserted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (file_id, part)
+);
+"""
+
+# Ingest statuses after which progress no longer changes
+TERMINAL_INGEST_STATUSES = ("ready", "failed", "cancelled")
+PROGRESS_COUNTERS = ("pages_parsed", "chunks_produced", "chunks_embedded", "points_upserted")
+
+# Sort keys accepted by list_page, mapped to their columns
+SORT_COLUMNS = {
+    "upload_date": "uploaded_at",
+    "name": "original_name",
+    "size": "size_bytes",
+}
+
+
+def encode_cursor(sort_value, file_id: str) -> str:
+    """Opaque keyset cursor for list_page."""
+    raw = json.dumps([sort_value, file_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    sort_value, file_id = json.loads(raw)
+    return sort_value, file_id
+
+
+class FileCatalog:
+    """SQLite-backed index of uploaded files keyed by file id."""
+    
+    def __init__(self, path: Path = CATALOG_PATH, uploads_dir: Path = UPLOADS_DIR):
+        self.path = Path(path)
+        self.uploads_dir = Path(uploads_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        if is_new:
+            self._import_existing_files()
+    
+    def _import_existing_files(self) -> None:
+        """One-time import of files uploaded before the catalog existed."""
+        with self._lock:
+            for file_path in self.uploads_dir.glob("*"):
+                # Same case-insensitive extension check as the upload endpoints
+                if file_path.suffix.lower() != ".pdf" or not file_path.is_file():
+                    continue
+                # Format: uuid_originalname.pdf
+                file_id, _, original_name = file_path.name.partition("_")
+                if not original_name:
+                    file_id, original_name = file_path.stem, file_path.name
+                digest = hashlib.sha256()
+                with open(file_path, "rb") as fp:
+                    while chunk := fp.read(1024 * 1024):
+                        digest.update(chunk)
+                stats = file_path.stat()
+                self.add(
+                    file_id=file_id,
+                    original_name=original_name,
+                    stored_path=str(file_path),
+                    content_hash=digest.hexdigest(),
+                    size_bytes=stats.st_size,
+                    status="ready",
+                    uploaded_at=datetime.fromtimestamp(stats.st_mtime).isoformat(),
+                )
+    
+    def add(
+        self,
+        file_id: str,
+        original_name: str,
+        stored_path: str,
+        content_hash: Optional[str],
+        size_bytes: int,
+        status: str = "processing",
+        uploaded_at: Optional[str] = None
+    ) -> dict:
+        """Insert a new file record and return it."""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO files (file_id, original_name, stored_path, content_hash, size_bytes, "
+                "status, uploaded_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_id, original_name, stored_path, content_hash, size_bytes,
+                 status, uploaded_at or now, now),
+            )
+            self._bump_version()
+        return self.get(file_id)
+    
+    def get(self, file_id: str) -> Optional[dict]:
+        """Look up a file by id."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def find_by_name(self, original_name: str) -> Optional[dict]:
+        """Look up the most recent upload with the given original name."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM files WHERE original_name = ? ORDER BY uploaded_at DESC LIMIT 1",
+                (original_name,),
+            ).fetchone()
+        return dict(row) if row else None
+    
+    def resolve(self, key: str) -> Optional[dict]:
+        """Look up a file by id, falling back to its original name."""
+        return self.get(key) or self.find_by_name(key)
+    
+    def _bump_version(self) -> None:
+        # Called inside the write transaction so readers never see a stale version
+        self._conn.execute("UPDATE catalog_meta SET value = value + 1 WHERE key = 'version'")
+    
+    def version(self) -> int:
+        """Counter incremented by every write; used to build listing ETags."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+        return row[0]
+    
+    def list_page(
+        self,
+        limit: Optional[int] = 50,
+        cursor: Optional[str] = None,
+        sort: str = "upload_date",
+        order: str = "desc",
+        name_contains: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        One page of files using keyset pagination.
+        
+        Args:
+            limit: Maximum number of files to return (None for all)
+            cursor: Cursor returned with the previous page
+            sort: One of SORT_COLUMNS
+            order: "asc" or "desc"
+            name_contains: Case-insensitive substring filter on the original name
+            status: Exact ingest status filter
+            
+        Returns:
+            The files and the cursor for the next page (None on the last page)
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unsupported order: {order}")
+        column = SORT_COLUMNS[sort]
+        
+        clauses, params = [], []
+        if name_contains:
+            escaped = name_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("original_name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if cursor:
+            comparison = "<" if order == "desc" else ">"
+            clauses.append(f"({column}, file_id) {comparison} (?, ?)")
+            params.extend(decode_cursor(cursor))
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = order.upper()
+        query = (
+            f"SELECT * FROM files {where} "
+            f"ORDER BY {column} {direction}, file_id {direction}"
+        )
+        if limit is not None:
+            # Fetch one extra row to know whether there is a next page
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        with self._lock:
+            rows = [dict(r) for r in self._conn.execute(query, params).fetchall()]
+        
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][column], rows[-1]["file_id"])
+        return rows, next_cursor
+    
+    def list_files(self) -> list[dict]:
+        """All files, most recent first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM files ORDER BY uploaded_at DESC").fetchall()
+        return [dict(r) for r in rows]
+    
+    def update(self, file_id: str, **fields) -> None:
+        """
+        Update ingest metadata of a file.
+        
+        Args:
+            file_id: File to update
+            **fields: Any of page_count, chunk_count, status, content_hash
+        """
+        allowed = {"page_count", "chunk_count", "status", "content_hash"}
+        unknown = set(fields) - allowed
+        if unknown:
+            raise ValueError(f"Unknown catalog fields: {sorted(unknown)}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE files SET {assignments}, updated_at = ? WHERE file_id = ?",
+                (*fields.values(), datetime.now().isoformat(), file_id),
+            )
+            self._bump_version()
+    
+    def delete(self, file_id: str) -> Optional[dict]:
+        """
+        Remove a file record and its file on disk in one transaction.
+        
+        Returns:
+            The deleted record, or None if it did not exist
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT * FROM files WHERE file_id = ?", (file_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM ingest_progress WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM ingest_parts WHERE file_id = ?", (file_id,))
+            self._bump_version()
+            # A failed unlink raises and rolls the row deletion back
+            Path(row["stored_path"]).unlink(missing_ok=True)
+        return dict(row)
+    
+    def rename(self, file_id: str, new_name: str) -> Optional[dict]:
+        """
+        Rename a file record and its file on disk in one transaction.
+        
+        Returns:
+            The updated record, or None if it did not exist
+            
+        Raises:
+            FileExistsError: If another file already has new_name
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT * FROM files WHERE file_id = ?", (file_id,)).fetchone()
+            if row is None:
+                return None
+            # Lookups by name must keep resolving to exactly one file
+            taken = self._conn.execute(
+                "SELECT 1 FROM files WHERE original_name = ? AND file_id != ?", (new_name, file_id)
+            ).fetchone()
+            if taken is not None:
+                raise FileExistsError(new_name)
+            old_path = Path(row["stored_path"])
+            new_path = old_path.with_name(f"{file_id}_{new_name}")
+            self._conn.execute(
+                "UPDATE files SET original_name = ?, stored_path = ?, updated_at = ? WHERE file_id = ?",
+                (new_name, str(new_path), datetime.now().isoformat(), file_id),
+            )
+            self._bump_version()
+            old_path.rename(new_path)
+        return self.get(file_id)
+
+    
+    def update_progress(
+        self,
+        file_id: str,
+        status: Optional[str] = None,
+        stage: Optional[str] = None,
+        stage_seconds: Optional[float] = None,
+        error: Optional[str] = None,
+        **counters: int
+    ) -> None:
+        """
+        Record ingest progress for a file.
+        
+        Args:
+            file_id: File being ingested
+            status: queued, running, ready or failed
+            stage: Stage currently running (or just finished)
+            stage_seconds: Duration of the stage, added to its timing
+            error: Error message for failed runs
+            **counters: Absolute values for any of PROGRESS_COUNTERS
+        """
+        unknown = set(counters) - set(PROGRESS_COUNTERS)
+        if unknown:
+            raise ValueError(f"Unknown progress counters: {sorted(unknown)}")
+        with self._lock, self._conn:
+            self._write_progress(file_id, status, stage, stage_seconds, error, counters)
+    
+    def _write_progress(self, file_id, status, stage, stage_seconds, error, counters) -> None:
+        # Caller holds the lock and the transaction
+        now = datetime.now().isoformat()
+        row = self._conn.execute(
+            "SELECT timings FROM ingest_progress WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        if row is None:
+            self._conn.execute(
+                "INSERT INTO ingest_progress (file_id, status, started_at, updated_at) VALUES (?, ?, ?, ?)",
+                (file_id, status or "running", now, now),
+            )
+            timings = {}
+        else:
+            timings = json.loads(row["timings"])
+        
+        fields = dict(counters, updated_at=now)
+        if status:
+            fields["status"] = status
+            if status in TERMINAL_INGEST_STATUSES:
+                fields["finished_at"] = now
+        if stage:
+            fields["stage"] = stage
+        if error is not None:
+            fields["error"] = error
+        if stage and stage_seconds is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + stage_seconds, 4)
+            fields["timings"] = json.dumps(timings)
+        
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._conn.execute(
+            f"UPDATE ingest_progress SET {assignments} WHERE file_id = ?",
+            (*fields.values(), file_id),
+        )
+    
+    def start_parts(self, file_id: str, parts: int) -> None:
+        """Register the page-range parts a large document was split into."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ingest_parts WHERE file_id = ?", (file_id,))
+            self._conn.executemany(
+                "INSERT INTO ingest_parts (file_id, part) VALUES (?, ?)",
+                [(file_id, part) for part in range(parts)],
+            )
+    
+    def update_part(
+        self,
+        file_id: str,
+        part: int,
+        stage: Optional[str] = None,
+        stage_seconds: Optional[float] = None,
+        done: bool = False,
+        **counters: int
+    ) -> int:
+        """
+        Record progress of one part and roll the totals up into the document.
+        
+        Counters are absolute per part, so retried parts never double count.
+        Once the document is failed or cancelled its progress is left as is.
+        
+        Args:
+            file_id: Document being ingested
+            part: Part index
+            stage: Stage the part is in
+            stage_seconds: Duration of the stage, added to the document timing
+            done: Mark the part as finished
+            **counters: Absolute values for any of PROGRESS_COUNTERS
+            
+        Returns:
+            Number of parts still unfinished
+        """
+        unknown = set(counters) - set(PROGRESS_COUNTERS)
+        if unknown:
+            raise ValueError(f"Unknown progress counters: {sorted(unknown)}")
+        fields = dict(counters)
+        if done:
+            fields["done"] = 1
+        with self._lock, self._conn:
+            if fields:
+                assignments = ", ".join(f"{name} = ?" for name in fields)
+                self._conn.execute(
+                    f"UPDATE ingest_parts SET {assignments} WHERE file_id = ? AND part = ?",
+                    (*fields.values(), file_id, part),
+                )
+            sums = ", ".join(f"COALESCE(SUM({name}), 0) AS {name}" for name in PROGRESS_COUNTERS)
+            totals = self._conn.execute(
+                f"SELECT {sums}, COALESCE(SUM(1 - done), 0) AS remaining FROM ingest_parts WHERE file_id = ?",
+                (file_id,),
+            ).fetchone()
+            current = self._conn.execute(
+                "SELECT status FROM ingest_progress WHERE file_id = ?", (file_id,)
+            ).fetchone()
+            # Parts still running after another part failed must not revive the document
+            if current is not None and current["status"] in TERMINAL_INGEST_STATUSES:
+                return totals["remaining"]
+            self._write_progress(
+                file_id, "running", stage, stage_seconds, None,
+                {name: totals[name] for name in PROGRESS_COUNTERS},
+            )
+        return totals["remaining"]
+    
+    def get_progress(self, file_id: str) -> Optional[dict]:
+        """Ingest progress of a file, or None if ingestion never started."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ingest_progress WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        progress = dict(row)
+        progress["timings"] = json.loads(progress["timings"])
+        return progress
+
+
+@fork_safe_cache
+def get_catalog() -> FileCatalog:
+    """Return the process-wide catalog, opening it on first use."""
+    return FileCatalog()
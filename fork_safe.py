@@ -0,0 +1,55 @@
+"""
+Process-wide objects created on first use and recreated after fork.
+
+gunicorn forks its workers from a preloaded master. Clients with connection
+pools, SQLite connections and process pools must not be shared across a fork,
+so each child builds its own on first use.
+"""
+
+import os
+import threading
+from functools import wraps
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+def fork_safe_cache(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Decorator that turns a zero-argument factory into a per-process singleton.
+
+    The first call in a process runs the factory under a lock, and later calls
+    return the same object. A forked child drops its parent's object and
+    creates its own on first use.
+
+    The returned function also has:
+        cached(): the current object, or None if none has been created yet
+        cache_clear(): forget the current object so the next call makes a new one
+    """
+    value = _MISSING
+    lock = threading.Lock()
+
+    @wraps(factory)
+    def get() -> T:
+        nonlocal value
+        if value is _MISSING:
+            with lock:
+                if value is _MISSING:
+                    value = factory()
+        return value
+
+    def cached() -> Optional[T]:
+        return None if value is _MISSING else value
+
+    def cache_clear() -> None:
+        nonlocal value, lock
+        value = _MISSING
+        # The parent may have held the lock at the moment it forked
+        lock = threading.Lock()
+
+    get.cached = cached
+    get.cache_clear = cache_clear
+    os.register_at_fork(after_in_child=cache_clear)
+    return get
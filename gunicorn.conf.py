@@ -0,0 +1,37 @@
+"""
+Gunicorn settings for multi-worker serving.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master and forked into WEB_CONCURRENCY
+Uvicorn workers, which share its read-only memory copy-on-write. Connections,
+SQLite handles and API clients are opened per worker on first use.
+Query-embedding and answer caches live in a shared SQLite file (see
+shared_cache.py), so every worker benefits from the others' hits.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Render and Railway set WEB_CONCURRENCY; default to one worker per core, capped
+# because each worker holds its own connection pools and lazily-loaded libraries
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 4))))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Import main before forking so workers start fast and share its pages
+preload_app = True
+
+# Long polls (query wait, SSE progress streams) outlive gunicorn's 30 s default
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 30
+keepalive = 5
+
+# Optional worker recycling (0 = off). Off by default: with WORKFLOW_BACKEND=local
+# a recycled worker would cancel the ingest runs it is executing
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
@@ -2,14 +2,16 @@ import logging
 from fastapi import FastAPI
 import inngest
 import inngest.fast_api
-from inngest.experimental import ai
 from dotenv import load_dotenv
-import uuid
 import os
 import datetime
-from data_loader import load_and_chunk_pdf, embed_text
-from vector_db import QdrantStorage
-from custom_types import RAGchunckandsrc, RAGQueryResult, RAGSearchResult, RAGUpsertResult
+from contextlib import asynccontextmanager
+from services import InngestAPIService
+import warmup
+from rag_workflows import (
+    InngestExecutor, ingest_pdf, ingest_pdf_part, ingest_pdf_batch, query_pdf, mark_failed, get_local_runner,
+    WORKFLOW_BACKEND, INGEST_CONCURRENCY, QUERY_CONCURRENCY, INGEST_BATCH_MAX_SIZE
+)
 
 load_dotenv()
 
@@ -20,90 +22,103 @@ inngest_client = inngest.Inngest(
     serializer = inngest.PydanticSerializer(),
 )
 
+# Flow control: every function draws from one env-scoped concurrency key, so
+# their priorities order a single queue and queued queries start before
+# queued ingest steps. Inngest allows two limits per function: ingest
+# functions share a second env-scoped key capped at INGEST_CONCURRENCY, so
+# at least RAG_CONCURRENCY - INGEST_CONCURRENCY slots stay free for queries,
+# and queries are bounded per source.
+RAG_CONCURRENCY = int(os.getenv("RAG_CONCURRENCY", str(INGEST_CONCURRENCY + QUERY_CONCURRENCY)))
+RAG_SHARED_CONCURRENCY = inngest.Concurrency(limit=RAG_CONCURRENCY, key='"rag"', scope="env")
+INGEST_SHARED_CONCURRENCY = inngest.Concurrency(limit=INGEST_CONCURRENCY, key='"rag-ingest"', scope="env")
+QUERY_SOURCE_CONCURRENCY = int(os.getenv("QUERY_SOURCE_CONCURRENCY", "8"))
+INGEST_BATCH_WINDOW_S = float(os.getenv("INGEST_BATCH_WINDOW_S", "5"))
+INGEST_BATCH_RETRIES = int(os.getenv("INGEST_BATCH_RETRIES", "4"))
+# Priority expressions return seconds to move a run ahead in the shared queue (-600..600)
+QUERY_PRIORITY = inngest.Priority(run="600")
+INGEST_PRIORITY = inngest.Priority(run="event.data.bulk == true ? -600 : 0")
+# Deleting or replacing a file sends rag/ingest_cancel for its file_id
+INGEST_CANCEL = [inngest.Cancel(event="rag/ingest_cancel", if_exp="event.data.file_id == async.data.file_id")]
+
+async def _mark_ingest_failed(ctx: inngest.Context) -> None:
+    original = ctx.event.data.get("event", {}).get("data", {})
+    error = ctx.event.data.get("error", {})
+    mark_failed(original.get("file_id"), error.get("message", error))
+
 @inngest_client.create_function(
     fn_id = "rag: ingest PDF",
-    trigger= inngest.TriggerEvent(event="rag/ingest_pdf")
+    trigger= inngest.TriggerEvent(event="rag/ingest_pdf", expression="event.data.small != true"),
+    on_failure=_mark_ingest_failed,
+    concurrency=[RAG_SHARED_CONCURRENCY, INGEST_SHARED_CONCURRENCY],
+    priority=INGEST_PRIORITY,
+    cancel=INGEST_CANCEL,
 )
 async def rag_ingest_pdf(ctx: inngest.Context):
-    def _load(ctx: inngest.Context) -> RAGchunckandsrc:
-        pdf_path = ctx.event.data.get("pdf_path")
-        source_id = ctx.event.data.get("source_id", pdf_path) 
-        chunks = load_and_chunk_pdf(pdf_path)
-        return RAGchunckandsrc(Chunks=chunks, Source_id=source_id)
-    
-    def _upsert(chuks_and_src: RAGchunckandsrc) -> RAGUpsertResult:
-        chunks = chuks_and_src.Chunks
-        source_id = chuks_and_src.Source_id
-        vecs = embed_text(chunks)
-        ids = [str(uuid.uuid5(uuid.NAMESPACE_URL, name=f"{source_id}:{i}")) for i in range(len(chunks))]
-        payloads = [{"text":chunks[i], "source":source_id} for i in range(len(chunks))]
-        QdrantStorage().upsert(ids, vecs, payloads)
-        return RAGUpsertResult(ingested=len(chunks))
-        
-    chunks_and_src = await ctx.step.run("load-an-chunk", lambda:_load(ctx), output_type=RAGchunckandsrc)
-    ingested = await ctx.step.run("embed-and-upsert", lambda:_upsert(chunks_and_src), output_type=RAGUpsertResult)
-    return ingested.model_dump()
+    return await ingest_pdf(InngestExecutor(ctx), ctx.event.data)
+
+@inngest_client.create_function(
+    fn_id = "rag: ingest PDF part",
+    trigger= inngest.TriggerEvent(event="rag/ingest_pdf_part"),
+    on_failure=_mark_ingest_failed,
+    concurrency=[RAG_SHARED_CONCURRENCY, INGEST_SHARED_CONCURRENCY],
+    priority=INGEST_PRIORITY,
+    cancel=INGEST_CANCEL,
+)
+async def rag_ingest_pdf_part(ctx: inngest.Context):
+    return await ingest_pdf_part(InngestExecutor(ctx), ctx.event.data)
+
+@inngest_client.create_function(
+    fn_id = "rag: ingest small PDF batch",
+    trigger= inngest.TriggerEvent(event="rag/ingest_pdf", expression="event.data.small == true"),
+    batch_events=inngest.Batch(
+        max_size=INGEST_BATCH_MAX_SIZE,
+        timeout=datetime.timedelta(seconds=INGEST_BATCH_WINDOW_S),
+    ),
+    retries=INGEST_BATCH_RETRIES,
+    # Batched functions take no priority; the batch runs at the default one
+    concurrency=[RAG_SHARED_CONCURRENCY, INGEST_SHARED_CONCURRENCY],
+)
+async def rag_ingest_pdf_batch(ctx: inngest.Context):
+    events = [event.data for event in ctx.events]
+    try:
+        return await ingest_pdf_batch(InngestExecutor(ctx), events)
+    except Exception as e:
+        # on_failure would only see the first event of the batch, so the run marks
+        # all of its files failed itself once no retry is left (a StepError means
+        # the step has used up its retries)
+        if isinstance(e, (inngest.StepError, inngest.NonRetriableError)) or ctx.attempt >= INGEST_BATCH_RETRIES:
+            for data in events:
+                mark_failed(data.get("file_id"), e)
+        raise
 
 @inngest_client.create_function(
     fn_id="RAG: Query PDF",
-    trigger=inngest.TriggerEvent(event="rag/query_pdf_ai")
+    trigger=inngest.TriggerEvent(event="rag/query_pdf_ai"),
+    concurrency=[
+        RAG_SHARED_CONCURRENCY,
+        inngest.Concurrency(limit=QUERY_SOURCE_CONCURRENCY, key="event.data.source_file"),
+    ],
+    priority=QUERY_PRIORITY,
 )
 async def rag_query_pdf_ai(ctx: inngest.Context):
-    def _search(question: str, top_k: int = 5, source_file: str = None) -> RAGSearchResult:
-        query_vec = embed_text([question])[0]
-        store = QdrantStorage()
-        found = store.search(query_vec, top_k, source_filter=source_file)
-        return RAGSearchResult(contexts=found["contexts"], sources=found["sources"])
-
-    question = ctx.event.data["question"]
-    top_k = int(ctx.event.data.get("top_k", 5))
-    source_file = ctx.event.data.get("source_file")
-
-    found = await ctx.step.run("embed-and-search", lambda: _search(question, top_k, source_file), output_type=RAGSearchResult)
-
-    context_block = "\n\n".join(f"- {c}" for c in found.contexts)
-    user_content = (
-        "Use the following context from the document to answer the question.\n\n"
-        f"Context:\n{context_block}\n\n"
-        f"Question: {question}\n"
-        "Provide a detailed and helpful answer based on the context above."
-    )
-
-    adapter = ai.openai.Adapter(
-        auth_key=os.getenv("OPENAI_API_KEY"),
-        model="gpt-4o-mini"
-    )
-
-    system_prompt = """You are a helpful AI assistant that answers questions based on provided document context.
-
-Your guidelines:
-1. Provide detailed, comprehensive answers using the context provided
-2. If the context contains the information, expand on it and explain thoroughly
-3. Structure your answers clearly with proper formatting
-4. If the context mentions topics but lacks details, acknowledge what's available and what's missing
-5. Be helpful and informative - don't be overly restrictive
-6. If asked to list or enumerate items from the context, do so clearly
-7. When the context has partial information, provide what's available rather than refusing to answer
-
-Always base your answers on the provided context, but be as helpful and detailed as possible."""
-
-    res = await ctx.step.ai.infer(
-        "llm-answer",
-        adapter=adapter,
-        body={
-            "max_tokens": 2048,  # Increased for more detailed answers
-            "temperature": 0.3,  # Slightly increased for more natural responses
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ]
-        }
-    )
-
-    answer = res["choices"][0]["message"]["content"].strip()
-    return {"answer": answer, "sources": found.sources, "num_contexts": len(found.contexts)}
-
-app = FastAPI()
+    return await query_pdf(InngestExecutor(ctx), ctx.event.data)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in the background: /api/health answers at once, /api/ready once warm
+    warmup_task = warmup.start()
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await InngestAPIService.close()
+    if WORKFLOW_BACKEND == "local":
+        await get_local_runner().close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Upload limits apply before the body is spooled; added first so CORS wraps its responses
+from api_routes import UploadGuardMiddleware
+app.add_middleware(UploadGuardMiddleware)
 
 # Enable CORS for React frontend
 from fastapi.middleware.cors import CORSMiddleware
@@ -131,4 +146,6 @@ app.add_middleware(
 from api_routes import router as api_router
 app.include_router(api_router)
 
-inngest.fast_api.serve(app, inngest_client, functions= [rag_ingest_pdf, rag_query_pdf_ai])
\ No newline at end of file
+# The same workflows run in-process when WORKFLOW_BACKEND=local
+if WORKFLOW_BACKEND == "inngest":
+    inngest.fast_api.serve(app, inngest_client, functions= [rag_ingest_pdf, rag_ingest_pdf_part, rag_ingest_pdf_batch, rag_query_pdf_ai])
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Prompt construction for question answering.
+Shared by the query workflow and the bulk query endpoint.
+"""
+
+from typing import TYPE_CHECKING
+from fork_safe import fork_safe_cache
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+LLM_MODEL = "gpt-4o-mini"
+
+SYSTEM_PROMPT = """You are a helpful AI assistant that answers questions based on provided document context.
+
+Your guidelines:
+1. Provide detailed, comprehensive answers using the context provided
+2. If the context contains the information, expand on it and explain thoroughly
+3. Structure your answers clearly with proper formatting
+4. If the context mentions topics but lacks details, acknowledge what's available and what's missing
+5. Be helpful and informative - don't be overly restrictive
+6. If asked to list or enumerate items from the context, do so clearly
+7. When the context has partial information, provide what's available rather than refusing to answer
+
+Always base your answers on the provided context, but be as helpful and detailed as possible."""
+
+
+def build_user_content(question: str, contexts: list[str]) -> str:
+    context_block = "\n\n".join(f"- {c}" for c in contexts)
+    return (
+        "Use the following context from the document to answer the question.\n\n"
+        f"Context:\n{context_block}\n\n"
+        f"Question: {question}\n"
+        "Provide a detailed and helpful answer based on the context above."
+    )
+
+
+def build_chat_body(question: str, contexts: list[str]) -> dict:
+    """Chat completion request body (without the model) for a question."""
+    return {
+        "max_tokens": 2048,  # Increased for more detailed answers
+        "temperature": 0.3,  # Slightly increased for more natural responses
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_user_content(question, contexts)}
+        ]
+    }
+
+
+@fork_safe_cache
+def llm_client() -> "AsyncOpenAI":
+    """Shared async OpenAI client, created (and openai imported) on first use."""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI()
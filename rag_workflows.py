@@ -0,0 +1,528 @@
+"""
+Ingest and query workflows, written against a small step executor interface.
+
+The same workflow code runs as Inngest functions (InngestExecutor, wired up in
+main.py) or in-process on asyncio (LocalExecutor and LocalRunner), for
+single-node deployments and for benchmarking the pipeline without an
+orchestrator. WORKFLOW_BACKEND selects which one the API dispatches to.
+"""
+
+import asyncio
+import inspect
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Union
+import numpy as np
+import inngest
+from dotenv import load_dotenv
+from data_loader import count_pdf_pages, load_pdf_pages, chunk_texts, embed_text, embed_queries, EMBED_BATCH_SIZE, EMBED_DIM
+from vector_db import get_storage
+from reranker import rerank, RERANK_CANDIDATES
+from file_catalog import get_catalog
+from prompts import LLM_MODEL, build_chat_body, llm_client
+import artifact_store
+from custom_types import RAGChunkRef, RAGArtifactRef, RAGBatchDoc, RAGBatchChunks, RAGSearchResult, RAGUpsertResult
+
+load_dotenv()
+
+# "inngest" sends events to the Inngest server; "local" runs workflows in this process
+WORKFLOW_BACKEND = os.getenv("WORKFLOW_BACKEND", "inngest")
+
+# Documents with more pages than this are split into parts ingested in parallel
+INGEST_PAGES_PER_PART = int(os.getenv("INGEST_PAGES_PER_PART", "100"))
+
+# Flow control: ingest is capped so queries always have worker capacity left
+# (main.py keeps RAG_CONCURRENCY above INGEST_CONCURRENCY by default)
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", "32"))
+# Small PDFs are collected into batches sharing one embedding pass
+INGEST_BATCH_MAX_SIZE = int(os.getenv("INGEST_BATCH_MAX_SIZE", "50"))
+
+# Local backend: a failed run is replayed up to this many times, skipping finished steps
+LOCAL_MAX_RETRIES = int(os.getenv("LOCAL_MAX_RETRIES", "3"))
+LOCAL_RETRY_BACKOFF_S = float(os.getenv("LOCAL_RETRY_BACKOFF_S", "1"))
+
+logger = logging.getLogger("uvicorn")
+
+
+class StepExecutor(ABC):
+    """
+    Durable step primitives the workflows are written against.
+    
+    A step's result is recorded once it succeeds; when a failed run is
+    retried, finished steps return their recorded result instead of running
+    again. Step ids must therefore be unique and deterministic within a run.
+    """
+    logger: logging.Logger = logger
+    
+    @abstractmethod
+    async def run(self, step_id: str, fn: Callable[[], Any], output_type: Any = None) -> Any:
+        """Run fn (sync or async) as a memoized step."""
+    
+    @abstractmethod
+    async def send_event(self, step_id: str, events: list[inngest.Event]) -> list[str]:
+        """Send events exactly once from within a run; returns their ids."""
+    
+    @abstractmethod
+    async def infer(self, step_id: str, body: dict) -> dict:
+        """Run a chat completion request (body without the model); returns the response JSON."""
+
+
+class InngestExecutor(StepExecutor):
+    """Executor backed by the step tools of an Inngest function context."""
+    
+    def __init__(self, ctx: inngest.Context):
+        self._ctx = ctx
+        self.logger = ctx.logger
+    
+    async def run(self, step_id: str, fn: Callable[[], Any], output_type: Any = None) -> Any:
+        if output_type is None:
+            return await self._ctx.step.run(step_id, fn)
+        return await self._ctx.step.run(step_id, fn, output_type=output_type)
+    
+    async def send_event(self, step_id: str, events: list[inngest.Event]) -> list[str]:
+        return await self._ctx.step.send_event(step_id, events)
+    
+    async def infer(self, step_id: str, body: dict) -> dict:
+        from inngest.experimental import ai
+        # The Inngest server makes the request, so no worker waits on the LLM
+        adapter = ai.openai.Adapter(
+            auth_key=os.getenv("OPENAI_API_KEY"),
+            model=LLM_MODEL
+        )
+        return await self._ctx.step.ai.infer(step_id, adapter=adapter, body=body)
+
+
+class LocalExecutor(StepExecutor):
+    """
+    In-process executor for one workflow run.
+    
+    Step results are memoized in memory, so when LocalRunner replays a failed
+    run only the steps that had not finished run again. Sync steps run in a
+    worker thread to keep the event loop free.
+    """
+    
+    def __init__(self, runner: "LocalRunner"):
+        self._runner = runner
+        self._memo: dict[str, Any] = {}
+    
+    async def _memoized(self, step_id: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if step_id not in self._memo:
+            self._memo[step_id] = await fn()
+        return self._memo[step_id]
+    
+    async def run(self, step_id: str, fn: Callable[[], Any], output_type: Any = None) -> Any:
+        async def call():
+            if inspect.iscoroutinefunction(fn):
+                return await fn()
+            return await asyncio.to_thread(fn)
+        return await self._memoized(step_id, call)
+    
+    async def send_event(self, step_id: str, events: list[inngest.Event]) -> list[str]:
+        return await self._memoized(step_id, lambda: self._runner.send(events))
+    
+    async def infer(self, step_id: str, body: dict) -> dict:
+        async def call():
+            response = await llm_client().chat.completions.create(model=LLM_MODEL, **body)
+            return response.model_dump()
+        return await self._memoized(step_id, call)
+
+
+def _cancelled(file_id: str) -> bool:
+    if not file_id:
+        return False
+    record = get_catalog().get(file_id)
+    return record is None or record["status"] == "cancelled"
+
+
+def _ensure_active(file_id: str, cleanup: bool = False) -> None:
+    # Cancellation only stops a run between steps, so steps check for it themselves
+    if _cancelled(file_id):
+        if cleanup:
+            # Drop points upserted while the cancel was in flight
+            get_storage().delete_file_points(file_id)
+        raise inngest.NonRetriableError(f"Ingest of {file_id} was cancelled")
+
+
+def mark_failed(file_id: str, error: Exception) -> None:
+    if file_id and not _cancelled(file_id):
+        get_catalog().update(file_id, status="failed")
+        get_catalog().update_progress(file_id, status="failed", error=str(error))
+
+
+def _progress(file_id: str, part: int = None, **fields) -> None:
+    if not file_id or _cancelled(file_id):
+        return
+    if part is None:
+        get_catalog().update_progress(file_id, **fields)
+    else:
+        fields.pop("status", None)
+        get_catalog().update_part(file_id, part, **fields)
+
+
+def _mark_ready(file_id: str, chunk_count: int) -> None:
+    if file_id and not _cancelled(file_id):
+        get_catalog().update(file_id, status="ready", chunk_count=chunk_count)
+        get_catalog().update_progress(file_id, status="ready")
+    artifact_store.prune()
+
+
+def _load(data: dict, part: int = None) -> RAGChunkRef:
+    file_id = data.get("file_id")
+    pdf_path = data.get("pdf_path")
+    source_id = data.get("source_id", pdf_path) 
+    _ensure_active(file_id)
+    _progress(file_id, part, status="running", stage="parse")
+    started = time.perf_counter()
+    pages = load_pdf_pages(pdf_path, data.get("page_start", 0), data.get("page_end"))
+    _progress(file_id, part, stage="parse", stage_seconds=time.perf_counter() - started, pages_parsed=len(pages))
+    started = time.perf_counter()
+    chunks = chunk_texts(pages)
+    _progress(file_id, part, stage="chunk", stage_seconds=time.perf_counter() - started, chunks_produced=len(chunks))
+    if file_id and part is None:
+        get_catalog().update(file_id, page_count=len(pages), chunk_count=len(chunks))
+    # Only a reference to the chunks goes into step state
+    return RAGChunkRef(Chunks=artifact_store.put_chunks(chunks), Source_id=source_id)
+
+
+def _point_ids(file_id: str, source_id: str, start: int, count: int, part: int = None) -> list[str]:
+    # Ids are scoped to the upload, so a replacement never overwrites the points of the run it cancels
+    prefix = file_id or source_id
+    # Parts number their chunks independently, so the part goes into the id
+    if part is not None:
+        prefix = f"{prefix}:p{part}"
+    return [str(uuid.uuid5(uuid.NAMESPACE_URL, name=f"{prefix}:{start + i}")) for i in range(count)]
+
+
+def _embed_and_upsert(data: dict, chunk_ref: RAGChunkRef, batch: int, part: int = None) -> RAGUpsertResult:
+    file_id = data.get("file_id")
+    _ensure_active(file_id)
+    start = batch * EMBED_BATCH_SIZE
+    chunks = artifact_store.get_chunks(chunk_ref.Chunks, start, start + EMBED_BATCH_SIZE)
+    source_id = chunk_ref.Source_id
+    started = time.perf_counter()
+    vecs = embed_text(chunks)
+    _progress(file_id, part, stage="embed", stage_seconds=time.perf_counter() - started, chunks_embedded=start + len(vecs))
+    ids = _point_ids(file_id, source_id, start, len(chunks), part)
+    payloads = [{"text":chunks[i], "source":source_id, "file_id":file_id} for i in range(len(chunks))]
+    started = time.perf_counter()
+    get_storage().upsert(ids, vecs, payloads)
+    _ensure_active(file_id, cleanup=True)
+    _progress(file_id, part, stage="upsert", stage_seconds=time.perf_counter() - started, points_upserted=start + len(ids))
+    return RAGUpsertResult(ingested=len(chunks))
+
+
+async def _embed_and_upsert_batches(step: "StepExecutor", data: dict, chunk_ref: RAGChunkRef, part: int = None) -> RAGUpsertResult:
+    # One durable step per batch: a retry resumes after the last upserted batch
+    batches = math.ceil(chunk_ref.Chunks.count / EMBED_BATCH_SIZE)
+    ingested = 0
+    for batch in range(batches):
+        result = await step.run(
+            f"embed-and-upsert-{batch}",
+            lambda batch=batch: _embed_and_upsert(data, chunk_ref, batch, part),
+            output_type=RAGUpsertResult,
+        )
+        ingested += result.ingested
+    return RAGUpsertResult(ingested=ingested)
+
+
+def _register_parts(file_id: str, page_count: int, parts: int) -> None:
+    catalog = get_catalog()
+    catalog.update(file_id, page_count=page_count)
+    catalog.start_parts(file_id, parts)
+    catalog.update_progress(file_id, status="running", stage="fan-out")
+
+
+def _complete_part(file_id: str, part: int) -> bool:
+    remaining = get_catalog().update_part(file_id, part, done=True)
+    if remaining == 0:
+        progress = get_catalog().get_progress(file_id)
+        _mark_ready(file_id, progress["chunks_produced"])
+    return remaining == 0
+
+
+def _load_batch(events: list[dict]) -> RAGBatchChunks:
+    def load(data: dict):
+        try:
+            return RAGBatchDoc(file_id=data.get("file_id"), chunk_ref=_load(data))
+        except Exception as e:
+            # One unreadable PDF must not fail the rest of the batch
+            mark_failed(data.get("file_id"), e)
+            return None
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(events) or 1)) as pool:
+        docs = [doc for doc in pool.map(load, events) if doc is not None]
+    return RAGBatchChunks(docs=docs)
+
+
+def _embed_batch(batch: RAGBatchChunks) -> RAGArtifactRef:
+    # Chunks of all documents are packed into full EMBED_BATCH_SIZE requests
+    all_chunks = []
+    owners = []
+    for doc in batch.docs:
+        chunks = artifact_store.get_chunks(doc.chunk_ref.Chunks)
+        all_chunks.extend(chunks)
+        owners.extend([doc.file_id] * len(chunks))
+    vecs = np.empty((len(all_chunks), EMBED_DIM), dtype=np.float32)
+    embedded = {}
+    for start in range(0, len(all_chunks), EMBED_BATCH_SIZE):
+        started = time.perf_counter()
+        vecs[start:start + EMBED_BATCH_SIZE] = embed_text(all_chunks[start:start + EMBED_BATCH_SIZE])
+        elapsed = time.perf_counter() - started
+        for file_id in owners[start:start + EMBED_BATCH_SIZE]:
+            embedded[file_id] = embedded.get(file_id, 0) + 1
+        for file_id in dict.fromkeys(owners[start:start + EMBED_BATCH_SIZE]):
+            _progress(file_id, stage="embed", stage_seconds=elapsed, chunks_embedded=embedded[file_id])
+    return artifact_store.put_vectors(vecs)
+
+
+def _upsert_batch(batch: RAGBatchChunks, vectors_ref: RAGArtifactRef) -> RAGUpsertResult:
+    all_vecs = artifact_store.get_vectors(vectors_ref)
+    ids, vec_parts, payloads, counts = [], [], [], {}
+    offset = 0
+    for doc in batch.docs:
+        source_id = doc.chunk_ref.Source_id
+        chunks = artifact_store.get_chunks(doc.chunk_ref.Chunks)
+        offset += len(chunks)
+        # Batched runs can't be cancelled by event, so deleted files are skipped here
+        if _cancelled(doc.file_id):
+            continue
+        ids.extend(_point_ids(doc.file_id, source_id, 0, len(chunks)))
+        vec_parts.append(all_vecs[offset - len(chunks):offset])
+        payloads.extend({"text": chunk, "source": source_id, "file_id": doc.file_id} for chunk in chunks)
+        counts[doc.file_id] = len(chunks)
+    started = time.perf_counter()
+    if ids:
+        get_storage().upsert(ids, np.concatenate(vec_parts), payloads)
+    elapsed = time.perf_counter() - started
+    for file_id in [file_id for file_id in counts if _cancelled(file_id)]:
+        # Deleted while the upsert was running
+        get_storage().delete_file_points(file_id)
+        del counts[file_id]
+    for file_id, count in counts.items():
+        _progress(file_id, stage="upsert", stage_seconds=elapsed, points_upserted=count)
+        _mark_ready(file_id, count)
+    return RAGUpsertResult(ingested=sum(counts.values()))
+
+
+async def ingest_pdf(step: StepExecutor, data: dict) -> dict:
+    """Ingest one PDF, fanning large documents out into page-range parts."""
+    file_id = data.get("file_id")
+
+    page_count = await step.run("count-pages", lambda: count_pdf_pages(data.get("pdf_path")), output_type=int)
+    if file_id and page_count > INGEST_PAGES_PER_PART:
+        # Fan out page ranges to any available worker; the last part to finish marks the file ready
+        ranges = [(start, min(start + INGEST_PAGES_PER_PART, page_count)) for start in range(0, page_count, INGEST_PAGES_PER_PART)]
+        await step.run("register-parts", lambda: _register_parts(file_id, page_count, len(ranges)))
+        await step.send_event("fan-out", [
+            inngest.Event(
+                name="rag/ingest_pdf_part",
+                data={**data, "part": part, "parts": len(ranges), "page_start": start, "page_end": end},
+            )
+            for part, (start, end) in enumerate(ranges)
+        ])
+        return {"parts": len(ranges), "pages": page_count}
+
+    chunk_ref = await step.run("load-an-chunk", lambda:_load(data), output_type=RAGChunkRef)
+    ingested = await _embed_and_upsert_batches(step, data, chunk_ref)
+    await step.run("mark-ready", lambda: _mark_ready(file_id, ingested.ingested))
+    if file_id:
+        step.logger.info("Ingested %s: %s", file_id, get_catalog().get_progress(file_id))
+    return ingested.model_dump()
+
+
+async def ingest_pdf_part(step: StepExecutor, data: dict) -> dict:
+    """Ingest one page range of a fanned-out PDF."""
+    file_id = data["file_id"]
+    part = int(data["part"])
+
+    chunk_ref = await step.run("load-an-chunk", lambda:_load(data, part), output_type=RAGChunkRef)
+    ingested = await _embed_and_upsert_batches(step, data, chunk_ref, part)
+    finished = await step.run("complete-part", lambda: _complete_part(file_id, part), output_type=bool)
+    if finished:
+        step.logger.info("Ingested %s in %s parts: %s", file_id, data.get("parts"), get_catalog().get_progress(file_id))
+    return {**ingested.model_dump(), "part": part, "document_ready": finished}
+
+
+async def ingest_pdf_batch(step: StepExecutor, events: list[dict]) -> dict:
+    """Ingest many small PDFs with one embedding pass and one upsert."""
+    batch = await step.run("load-batch", lambda: _load_batch(events), output_type=RAGBatchChunks)
+    vectors_ref = await step.run("embed-batch", lambda: _embed_batch(batch), output_type=RAGArtifactRef)
+    ingested = await step.run("upsert-batch", lambda: _upsert_batch(batch, vectors_ref), output_type=RAGUpsertResult)
+    return {**ingested.model_dump(), "documents": len(batch.docs), "events": len(events)}
+
+
+def _search(question: str, top_k: int = 5, source_file: str = None, use_rerank: bool = False, adaptive: bool = False) -> RAGSearchResult:
+    if use_rerank and adaptive:
+        raise inngest.NonRetriableError("rerank and adaptive cannot be combined")
+    query_vec = embed_queries([question])[0]
+    store = get_storage()
+    if use_rerank:
+        # Over-fetch, then keep the best few after lexical reranking
+        candidates = store.search_candidates(query_vec, max(top_k, RERANK_CANDIDATES), source_filter=source_file)
+        found = store.to_result(rerank(question, candidates, top_k))
+    else:
+        found = store.search(query_vec, top_k, source_filter=source_file, adaptive=adaptive)
+    return RAGSearchResult(contexts=found["contexts"], sources=found["sources"], scores=found["scores"])
+
+
+async def query_pdf(step: StepExecutor, data: dict) -> dict:
+    """Answer a question from the retrieved document contexts."""
+    question = data["question"]
+    top_k = int(data.get("top_k", 5))
+    source_file = data.get("source_file")
+    use_rerank = bool(data.get("rerank", False))
+    adaptive = bool(data.get("adaptive", False))
+
+    found = await step.run("embed-and-search", lambda: _search(question, top_k, source_file, use_rerank, adaptive), output_type=RAGSearchResult)
+
+    res = await step.infer("llm-answer", build_chat_body(question, found.contexts))
+
+    answer = res["choices"][0]["message"]["content"].strip()
+    return {"answer": answer, "sources": found.sources, "num_contexts": len(found.contexts), "scores": found.scores}
+
+
+class LocalRunner:
+    """
+    Runs workflows in-process in place of the Inngest server.
+    
+    Events are routed to workflows by name. Ingest and query runs are bounded
+    by separate semaphores, failed runs are replayed with exponential backoff
+    (finished steps are skipped), and rag/ingest_cancel cancels the single-file
+    runs of a file. Query outputs are kept until wait_for_output collects them.
+    """
+    
+    def __init__(
+        self,
+        ingest_concurrency: int = INGEST_CONCURRENCY,
+        query_concurrency: int = QUERY_CONCURRENCY,
+        max_retries: int = LOCAL_MAX_RETRIES,
+        retry_backoff_s: float = LOCAL_RETRY_BACKOFF_S
+    ):
+        self._lanes = {
+            "ingest": asyncio.Semaphore(ingest_concurrency),
+            "query": asyncio.Semaphore(query_concurrency),
+        }
+        self._max_retries = max_retries
+        self._retry_backoff_s = retry_backoff_s
+        self._runs: dict[str, asyncio.Task] = {}
+        self._outputs: dict[str, asyncio.Task] = {}
+    
+    async def send(self, events: Union[inngest.Event, list[inngest.Event]]) -> list[str]:
+        """Start a run for each event; returns one id per event."""
+        if isinstance(events, inngest.Event):
+            events = [events]
+        ids = [str(uuid.uuid4()) for _ in events]
+        small = []
+        for event_id, event in zip(ids, events):
+            data = dict(event.data)
+            if event.name == "rag/ingest_cancel":
+                self.cancel(data["file_id"])
+            elif event.name == "rag/ingest_pdf" and data.get("small"):
+                small.append(data)
+            elif event.name == "rag/ingest_pdf":
+                self._start(event_id, "ingest", ingest_pdf, data, [data.get("file_id")])
+            elif event.name == "rag/ingest_pdf_part":
+                self._start(event_id, "ingest", ingest_pdf_part, data, [data.get("file_id")])
+            elif event.name == "rag/query_pdf_ai":
+                self._outputs[event_id] = self._start(event_id, "query", query_pdf, data)
+            else:
+                logger.warning("No local workflow for event %s", event.name)
+        # Small PDFs sent together share one batched run, as with Inngest event batching.
+        # Cancelling it would stop the other files too, so a cancelled file is
+        # dropped by the run's own _cancelled() checks instead
+        for start in range(0, len(small), INGEST_BATCH_MAX_SIZE):
+            chunk = small[start:start + INGEST_BATCH_MAX_SIZE]
+            self._start(
+                str(uuid.uuid4()), "ingest", ingest_pdf_batch, chunk,
+                [data.get("file_id") for data in chunk], cancellable=False
+            )
+        return ids
+    
+    def _start(
+        self, run_id: str, lane: str, workflow: Callable, data: Any, file_ids: list = (), cancellable: bool = True
+    ) -> asyncio.Task:
+        task = asyncio.create_task(self._execute(lane, workflow, data, file_ids))
+        # Files whose cancellation cancels this task
+        task.file_ids = set(file_ids) if cancellable else set()
+        self._runs[run_id] = task
+        task.add_done_callback(lambda t: self._finished(run_id, t))
+        return task
+    
+    def _finished(self, run_id: str, task: asyncio.Task) -> None:
+        self._runs.pop(run_id, None)
+        if run_id not in self._outputs and not task.cancelled() and task.exception() is not None:
+            logger.error("Local run %s failed: %s", run_id, task.exception())
+    
+    async def _execute(self, lane: str, workflow: Callable, data: Any, file_ids: list) -> dict:
+        async with self._lanes[lane]:
+            step = LocalExecutor(self)
+            for attempt in range(self._max_retries + 1):
+                try:
+                    return await workflow(step, data)
+                except inngest.NonRetriableError as e:
+                    error = e
+                    break
+                except Exception as e:
+                    error = e
+                    if attempt < self._max_retries:
+                        await asyncio.sleep(self._retry_backoff_s * 2 ** attempt * random.uniform(0.5, 1.0))
+            if lane == "ingest":
+                for file_id in file_ids:
+                    await asyncio.to_thread(mark_failed, file_id, error)
+            raise error
+    
+    def cancel(self, file_id: str) -> None:
+        """Cancel the single-file ingest runs of a file."""
+        for task in list(self._runs.values()):
+            if file_id in task.file_ids:
+                task.cancel()
+    
+    async def wait_for_output(self, event_id: str, timeout_s: float = 120.0) -> dict:
+        """
+        Wait for the output of a query run.
+        
+        Raises:
+            TimeoutError: If the run does not finish in time
+            RuntimeError: If the run failed
+        """
+        task = self._outputs.get(event_id)
+        if task is None:
+            raise RuntimeError(f"Unknown run for event {event_id}")
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout_s)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Run for event {event_id} did not finish in {timeout_s}s")
+        except asyncio.CancelledError:
+            if task.cancelled():
+                raise RuntimeError("Run was cancelled")
+            raise
+        except Exception as e:
+            raise RuntimeError(str(e)) from e
+        finally:
+            self._outputs.pop(event_id, None)
+    
+    async def close(self) -> None:
+        """Cancel outstanding runs."""
+        tasks = list(self._runs.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._outputs.clear()
+
+
+_local_runner: Optional[LocalRunner] = None
+
+
+def get_local_runner() -> LocalRunner:
+    """Process-wide LocalRunner."""
+    global _local_runner
+    if _local_runner is None:
+        _local_runner = LocalRunner()
+    return _local_runner
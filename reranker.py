@@ -0,0 +1,107 @@
+"""
+Lexical reranking for dense retrieval results.
+Scores an over-fetched candidate pool with BM25 and blends it with the dense score.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+
+# Number of candidates fetched from Qdrant before reranking
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+# Weight of the dense score in the blended score (1 - alpha goes to BM25)
+RERANK_ALPHA = float(os.getenv("RERANK_ALPHA", "0.5"))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokenizer shared by queries and candidates."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def bm25_scores(
+    query_tokens: list[str],
+    docs_tokens: list[list[str]],
+    k1: float = 1.5,
+    b: float = 0.75
+) -> list[float]:
+    """
+    Score each document against the query with Okapi BM25.
+    
+    Document frequencies are computed over the candidate pool only, which is
+    enough to separate candidates that were already judged relevant by the
+    dense search.
+    
+    Args:
+        query_tokens: Tokenized query
+        docs_tokens: Tokenized candidate documents
+        k1: Term frequency saturation
+        b: Length normalization strength
+        
+    Returns:
+        One BM25 score per document
+    """
+    n_docs = len(docs_tokens)
+    if n_docs == 0:
+        return []
+    
+    avg_len = sum(len(d) for d in docs_tokens) / n_docs or 1.0
+    query_terms = set(query_tokens)
+    
+    df = Counter()
+    for tokens in docs_tokens:
+        df.update(query_terms.intersection(tokens))
+    idf = {
+        term: math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+        for term in query_terms
+    }
+    
+    scores = []
+    for tokens in docs_tokens:
+        tf = Counter(tokens)
+        norm = k1 * (1 - b + b * len(tokens) / avg_len)
+        score = 0.0
+        for term in query_terms:
+            freq = tf.get(term)
+            if freq:
+                score += idf[term] * freq * (k1 + 1) / (freq + norm)
+        scores.append(score)
+    return scores
+
+
+def _min_max(values: list[float]) -> list[float]:
+    lo, hi = min(values), max(values)
+    if hi - lo <= 0:
+        return [1.0 if hi > 0 else 0.0 for _ in values]
+    return [(v - lo) / (hi - lo) for v in values]
+
+
+def rerank(question: str, hits: list[dict], top_k: int, alpha: float = None) -> list[dict]:
+    """
+    Rerank dense search hits by blending their dense score with BM25.
+    
+    Args:
+        question: User's question
+        hits: Candidates from QdrantStorage.search_candidates
+        top_k: Number of hits to keep
+        alpha: Weight of the normalized dense score (defaults to RERANK_ALPHA)
+        
+    Returns:
+        The best top_k hits, each with an added "rerank_score"
+    """
+    if not hits:
+        return []
+    alpha = RERANK_ALPHA if alpha is None else alpha
+    
+    lexical = bm25_scores(tokenize(question), [tokenize(h["text"]) for h in hits])
+    dense = _min_max([h["score"] for h in hits])
+    lexical = _min_max(lexical)
+    
+    blended = [
+        {**hit, "rerank_score": alpha * d + (1 - alpha) * l}
+        for hit, d, l in zip(hits, dense, lexical)
+    ]
+    blended.sort(key=lambda h: h["rerank_score"], reverse=True)
+    return blended[:top_k]
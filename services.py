@@ -5,13 +5,41 @@ Handles Inngest client, event sending, and API interactions.
 
 import os
 import time
+import asyncio
+import uuid
+import hashlib
 from pathlib import Path
-import requests
+from typing import Optional
+import httpx
 import inngest
 from dotenv import load_dotenv
+from custom_types import SavedUpload
+from fork_safe import fork_safe_cache
 
 load_dotenv()
 
+# Uploads are copied in fixed-size chunks so memory per upload stays constant
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+PDF_MAGIC = b"%PDF-"
+
+# Inngest API client: pooled keep-alive connections, bounded timeouts and retries
+INNGEST_API_TIMEOUT_S = float(os.getenv("INNGEST_API_TIMEOUT_S", "10"))
+INNGEST_API_RETRIES = int(os.getenv("INNGEST_API_RETRIES", "3"))
+INNGEST_API_MAX_CONNECTIONS = int(os.getenv("INNGEST_API_MAX_CONNECTIONS", "50"))
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+
+class InvalidPDFError(ValueError):
+    """Raised when an upload does not start with the PDF magic bytes."""
+
+
+class InvalidFilenameError(ValueError):
+    """Raised when an upload's file name can't be stored safely."""
+
 
 class InngestService:
     """Service for managing Inngest client and event operations."""
@@ -66,26 +94,153 @@ class InngestService:
         return result[0]
 
 
+class StreamingFileWriter:
+    """
+    Write a file chunk by chunk to a temp file next to its destination.
+    
+    The SHA-256 hash, size cap and PDF magic bytes are checked as data
+    arrives; commit() moves the file into place atomically.
+    """
+    
+    def __init__(self, dest: Path, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.dest = dest
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._head = b""
+        self._tmp_path = dest.parent / f".upload-{uuid.uuid4().hex}.part"
+        # O_EXCL with mode 0o666 gives the umask-based permissions a plain open() would
+        fd = os.open(self._tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        self._fp = os.fdopen(fd, "wb")
+    
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk, raising if the size cap or magic check fails."""
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(f"File exceeds the {self.max_bytes} byte limit")
+        if len(self._head) < len(PDF_MAGIC):
+            self._head += chunk[:len(PDF_MAGIC)]
+            if len(self._head) >= len(PDF_MAGIC) and not self._head.startswith(PDF_MAGIC):
+                raise InvalidPDFError("File is not a valid PDF")
+        self._hash.update(chunk)
+        self._fp.write(chunk)
+    
+    def commit(self) -> SavedUpload:
+        """Flush, validate and atomically rename the temp file into place."""
+        if not self._head.startswith(PDF_MAGIC):
+            self.abort()
+            raise InvalidPDFError("File is not a valid PDF")
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._fp.close()
+        os.replace(self._tmp_path, self.dest)
+        return SavedUpload(path=str(self.dest), size_bytes=self.size, sha256=self._hash.hexdigest())
+    
+    def abort(self) -> None:
+        """Discard the partial file."""
+        if not self._fp.closed:
+            self._fp.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
 class FileService:
     """Service for file operations."""
     
     @staticmethod
-    def save_uploaded_pdf(file) -> Path:
+    def safe_filename(filename: Optional[str]) -> str:
+        """
+        Reduce a client-supplied file name to its final path component.
+        
+        Raises:
+            InvalidFilenameError: If nothing usable is left or it still contains a separator
+        """
+        name = Path(filename or "").name
+        if name in ("", ".", "..") or "/" in name or "\\" in name or "\0" in name:
+            raise InvalidFilenameError(f"Invalid file name: {filename!r}")
+        return name
+    
+    @staticmethod
+    def upload_path(uploads_dir: Path, file_id: str, filename: str) -> Path:
+        """
+        Destination for an upload inside uploads_dir.
+        
+        Args:
+            uploads_dir: Directory uploads are stored in
+            file_id: Catalog id of the upload
+            filename: Name from FileService.safe_filename
+            
+        Raises:
+            InvalidFilenameError: If the path would land outside uploads_dir
+        """
+        uploads_dir.mkdir(parents=True, exist_ok=True)
+        dest = uploads_dir / f"{file_id}_{FileService.safe_filename(filename)}"
+        if dest.resolve().parent != uploads_dir.resolve():
+            raise InvalidFilenameError(f"Invalid file name: {filename!r}")
+        return dest
+    
+    @staticmethod
+    def write_stream(fileobj, dest: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> SavedUpload:
+        """
+        Copy a readable binary stream to dest in fixed-size chunks.
+        
+        Args:
+            fileobj: Object with a read(size) method
+            dest: Final path of the file
+            max_bytes: Size cap for the file
+            
+        Returns:
+            Saved path, size and SHA-256 of the file
+        """
+        writer = StreamingFileWriter(dest, max_bytes)
+        try:
+            while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+                writer.write(chunk)
+            return writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+    
+    @staticmethod
+    async def stream_upload(file, dest: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> SavedUpload:
         """
-        Save uploaded PDF file to uploads directory.
+        Stream a FastAPI UploadFile to dest without holding it in memory.
         
         Args:
             file: Uploaded file object
+            dest: Final path of the file
+            max_bytes: Size cap for the upload
             
         Returns:
-            Path to saved file
+            Saved path, size and SHA-256 of the file
+            
+        Raises:
+            UploadTooLargeError: If the file exceeds max_bytes
+            InvalidPDFError: If the file is not a PDF
         """
-        uploads_dir = Path("uploads")
-        uploads_dir.mkdir(parents=True, exist_ok=True)
-        file_path = uploads_dir / file.name
-        file_bytes = file.getbuffer()
-        file_path.write_bytes(file_bytes)
-        return file_path
+        # Reject before copying anything when the size is already known
+        if getattr(file, "size", None) and file.size > max_bytes:
+            raise UploadTooLargeError(f"File exceeds the {max_bytes} byte limit")
+        
+        writer = await asyncio.to_thread(StreamingFileWriter, dest, max_bytes)
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(writer.write, chunk)
+            return await asyncio.to_thread(writer.commit)
+        except BaseException:
+            writer.abort()
+            raise
+
+
+@fork_safe_cache
+def _inngest_http() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=InngestAPIService.get_api_base(),
+        timeout=httpx.Timeout(INNGEST_API_TIMEOUT_S, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=INNGEST_API_MAX_CONNECTIONS,
+            max_keepalive_connections=INNGEST_API_MAX_CONNECTIONS,
+        ),
+    )
 
 
 class InngestAPIService:
@@ -97,24 +252,52 @@ class InngestAPIService:
         return os.getenv("INNGEST_API_BASE", "http://127.0.0.1:8288/v1")
     
     @classmethod
-    def fetch_runs(cls, event_id: str) -> list[dict]:
+    def http(cls) -> httpx.AsyncClient:
+        """Get or create the shared pooled HTTP client."""
+        if _inngest_http().is_closed:
+            _inngest_http.cache_clear()
+        return _inngest_http()
+    
+    @classmethod
+    async def close(cls) -> None:
+        """Close the shared HTTP client (called on app shutdown)."""
+        client = _inngest_http.cached()
+        if client is not None:
+            _inngest_http.cache_clear()
+            await client.aclose()
+    
+    @classmethod
+    async def fetch_runs(cls, event_id: str) -> list[dict]:
         """
         Fetch runs for a given event ID.
         
+        Transport errors, 429s and 5xx responses are retried with
+        exponential backoff.
+        
         Args:
             event_id: Event ID to fetch runs for
             
         Returns:
             List of run data
         """
-        url = f"{cls.get_api_base()}/events/{event_id}/runs"
-        resp = requests.get(url)
+        url = f"/events/{event_id}/runs"
+        for attempt in range(INNGEST_API_RETRIES + 1):
+            try:
+                resp = await cls.http().get(url)
+                if resp.status_code != 429 and resp.status_code < 500:
+                    break
+                if attempt == INNGEST_API_RETRIES:
+                    break
+            except httpx.TransportError:
+                if attempt == INNGEST_API_RETRIES:
+                    raise
+            await asyncio.sleep(0.1 * 2 ** attempt)
         resp.raise_for_status()
         data = resp.json()
         return data.get("data", [])
     
     @classmethod
-    def wait_for_run_output(
+    async def wait_for_run_output(
         cls, 
         event_id: str, 
         timeout_s: float = 120.0, 
@@ -139,7 +322,7 @@ class InngestAPIService:
         last_status = None
         
         while True:
-            runs = cls.fetch_runs(event_id)
+            runs = await cls.fetch_runs(event_id)
             if runs:
                 run = runs[0]
                 status = run.get("status")
@@ -156,5 +339,4 @@ class InngestAPIService:
                     f"Timed out waiting for run output (last status: {last_status})"
                 )
             
-            time.sleep(poll_interval_s)
-
+            await asyncio.sleep(poll_interval_s)
@@ -0,0 +1,186 @@
+"""
+Read-mostly caches shared by every worker process.
+Backed by one SQLite file in WAL mode, so a hit stored by one gunicorn worker
+is served by all of them and survives worker restarts.
+"""
+
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Optional
+import numpy as np
+from dotenv import load_dotenv
+from fork_safe import fork_safe_cache
+
+load_dotenv()
+
+SHARED_CACHE_PATH = Path(os.getenv("SHARED_CACHE_PATH", "cache/shared_cache.sqlite3"))
+# Query embeddings never go stale for a fixed model; answers are also keyed by the catalog version
+QUERY_EMBED_CACHE_TTL_S = float(os.getenv("QUERY_EMBED_CACHE_TTL_S", str(7 * 24 * 3600)))
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "3600"))
+# Entries kept per namespace; expired and excess entries are trimmed now and then on writes
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "100000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_expiry ON cache(namespace, expires_at);
+CREATE TABLE IF NOT EXISTS query_log (
+    question TEXT PRIMARY KEY,
+    asked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_query_log_asked ON query_log(asked_at);
+"""
+
+# Fraction of writes that also trim the namespace
+_TRIM_PROBABILITY = 0.01
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for a tuple of JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SharedCache:
+    """
+    Namespaced key/value cache in a SQLite file shared across processes.
+
+    Every process opens its own connection; SQLite's WAL mode lets readers
+    in all workers proceed while one of them writes.
+    """
+
+    def __init__(self, path: Path = SHARED_CACHE_PATH, max_entries: int = SHARED_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Another worker may hold the write lock briefly
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """Return the stored value, or None when missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, namespace: str, keys: list[str]) -> dict[str, bytes]:
+        """Return the stored values of the keys that are present."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache WHERE namespace = ? AND expires_at > ? "
+                    f"AND key IN ({', '.join('?' * len(batch))})",
+                    (namespace, now, *batch),
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def set(self, namespace: str, key: str, value: bytes, ttl_s: float) -> None:
+        """Store a value for ttl_s seconds."""
+        self.set_many(namespace, {key: value}, ttl_s)
+
+    def set_many(self, namespace: str, items: dict[str, bytes], ttl_s: float) -> None:
+        """Store several values for ttl_s seconds in one transaction."""
+        if not items:
+            return
+        expires_at = time.time() + ttl_s
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                [(namespace, key, value, expires_at) for key, value in items.items()],
+            )
+            if random.random() < _TRIM_PROBABILITY * len(items):
+                self._trim(namespace)
+
+    def _trim(self, namespace: str) -> None:
+        # Caller holds the lock and the transaction
+        self._conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (namespace, time.time())
+        )
+        self._conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (namespace, namespace, self.max_entries),
+        )
+
+    def log_query(self, question: str) -> None:
+        """Record that a question was asked, for warming caches after a restart."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_log (question, asked_at) VALUES (?, ?)",
+                (question, time.time()),
+            )
+            if random.random() < _TRIM_PROBABILITY:
+                self._conn.execute(
+                    "DELETE FROM query_log WHERE question IN ("
+                    "SELECT question FROM query_log ORDER BY asked_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def recent_queries(self, limit: int) -> list[str]:
+        """Most recently asked distinct questions, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question FROM query_log ORDER BY asked_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@fork_safe_cache
+def get_shared_cache() -> SharedCache:
+    """Return this process's handle to the shared cache, opening it on first use."""
+    return SharedCache()
+
+
+def get_query_embeddings(model: str, questions: list[str]) -> dict[str, np.ndarray]:
+    """Cached float32 query embeddings, by question."""
+    keys = {cache_key(model, question): question for question in questions}
+    found = get_shared_cache().get_many("query_embedding", list(keys))
+    return {keys[key]: np.frombuffer(value, dtype="<f4") for key, value in found.items()}
+
+
+def put_query_embeddings(model: str, questions: list[str], vectors: np.ndarray) -> None:
+    """Cache float32 query embeddings, one row per question."""
+    matrix = np.ascontiguousarray(vectors, dtype="<f4")
+    get_shared_cache().set_many(
+        "query_embedding",
+        {cache_key(model, question): matrix[i].tobytes() for i, question in enumerate(questions)},
+        QUERY_EMBED_CACHE_TTL_S,
+    )
+
+
+def get_answer(key: str) -> Optional[dict]:
+    """Cached query response for a key built with cache_key."""
+    value = get_shared_cache().get("answer", key)
+    return json.loads(value) if value is not None else None
+
+
+def put_answer(key: str, answer: dict) -> None:
+    """Cache a query response for ANSWER_CACHE_TTL_S seconds."""
+    get_shared_cache().set("answer", key, json.dumps(answer).encode(), ANSWER_CACHE_TTL_S)
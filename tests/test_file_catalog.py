@@ -0,0 +1,56 @@
+import pytest
+
+from file_catalog import FileCatalog
+
+
+def make_catalog(tmp_path) -> FileCatalog:
+    catalog = FileCatalog(tmp_path / "catalog.sqlite3", tmp_path)
+    catalog.add(
+        file_id="doc", original_name="doc.pdf", stored_path=str(tmp_path / "doc_doc.pdf"),
+        content_hash=None, size_bytes=1,
+    )
+    return catalog
+
+
+def test_parts_roll_up_into_document_progress(tmp_path):
+    catalog = make_catalog(tmp_path)
+    catalog.start_parts("doc", 2)
+    catalog.update_part("doc", 0, stage="chunk", chunks_produced=3)
+    assert catalog.update_part("doc", 1, stage="chunk", chunks_produced=4, done=True) == 1
+    progress = catalog.get_progress("doc")
+    assert progress["status"] == "running"
+    assert progress["chunks_produced"] == 7
+
+
+def test_failed_part_is_not_overwritten_by_a_running_part(tmp_path):
+    catalog = make_catalog(tmp_path)
+    catalog.start_parts("doc", 2)
+    catalog.update_part("doc", 0, stage="embed", chunks_embedded=2)
+    catalog.update_part("doc", 1, stage="embed", chunks_embedded=2)
+    # Part 0 fails while part 1 is still embedding
+    catalog.update("doc", status="failed")
+    catalog.update_progress("doc", status="failed", error="embed failed")
+    remaining = catalog.update_part("doc", 1, stage="upsert", points_upserted=4, done=True)
+
+    assert remaining == 1
+    progress = catalog.get_progress("doc")
+    assert progress["status"] == "failed"
+    assert progress["error"] == "embed failed"
+    assert progress["finished_at"] is not None
+    assert catalog.get("doc")["status"] == "failed"
+
+
+def test_rename_to_a_taken_name_is_refused(tmp_path):
+    catalog = make_catalog(tmp_path)
+    (tmp_path / "doc_doc.pdf").write_bytes(b"%PDF-")
+    catalog.add(
+        file_id="other", original_name="other.pdf", stored_path=str(tmp_path / "other_other.pdf"),
+        content_hash=None, size_bytes=1,
+    )
+    with pytest.raises(FileExistsError):
+        catalog.rename("doc", "other.pdf")
+    assert catalog.find_by_name("other.pdf")["file_id"] == "other"
+
+    renamed = catalog.rename("doc", "renamed.pdf")
+    assert renamed["original_name"] == "renamed.pdf"
+    assert (tmp_path / "doc_renamed.pdf").exists()
@@ -1,15 +1,64 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue
+# qdrant_client takes most of a second to import, so it is imported on first use
 import os
+import numpy as np
 from dotenv import load_dotenv
+from fork_safe import fork_safe_cache
 
 load_dotenv()
 
+# Adaptive top_k: drop hits below an absolute score or after a relative score drop
+ADAPTIVE_MIN_SCORE = float(os.getenv("ADAPTIVE_MIN_SCORE", "0.25"))
+ADAPTIVE_MAX_GAP = float(os.getenv("ADAPTIVE_MAX_GAP", "0.2"))
+ADAPTIVE_MIN_K = int(os.getenv("ADAPTIVE_MIN_K", "1"))
+ADAPTIVE_MAX_K = int(os.getenv("ADAPTIVE_MAX_K", "10"))
+
+# Points per upsert request; vectors are converted for the request one batch at a time
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "64"))
+
+
+def adaptive_cutoff(
+    hits: list[dict],
+    min_score: float = ADAPTIVE_MIN_SCORE,
+    max_gap: float = ADAPTIVE_MAX_GAP,
+    min_k: int = ADAPTIVE_MIN_K,
+    max_k: int = ADAPTIVE_MAX_K
+) -> list[dict]:
+    """
+    Trim score-ordered hits to the ones worth sending to the LLM.
+    
+    A hit is dropped once its score falls below min_score, or once it is more
+    than max_gap (as a fraction of the previous score) below the hit before it.
+    At least min_k and at most max_k hits are kept.
+    
+    Args:
+        hits: Hits sorted by descending score
+        min_score: Absolute score threshold
+        max_gap: Relative drop between consecutive hits that ends the list
+        min_k: Minimum number of hits to keep
+        max_k: Maximum number of hits to keep
+        
+    Returns:
+        The leading hits that pass the cutoff
+    """
+    kept = 0
+    for i, hit in enumerate(hits[:max_k]):
+        if i >= min_k:
+            if hit["score"] < min_score:
+                break
+            prev = hits[i - 1]["score"]
+            if prev > 0 and (prev - hit["score"]) / prev > max_gap:
+                break
+        kept = i + 1
+    return hits[:kept]
+
+
 class QdrantStorage:
     def __init__(self, url=None, api_key=None, collection="docs", dim=3072): 
         # Get from environment variables if not provided
         url = url or os.getenv("QDRANT_URL", "http://localhost:6333")
         api_key = api_key or os.getenv("QDRANT_API_KEY")
+        from qdrant_client import QdrantClient
+        from qdrant_client.models import VectorParams, Distance
         
         # Initialize client with or without API key
         if api_key:
@@ -25,15 +74,45 @@ class QdrantStorage:
             )
             
     def upsert(self, ids, vectors, payloads):
-        points = [PointStruct(id=ids[i], vector=vectors[i], payload=payloads[i]) for i in range(len(ids))]
-        self.client.upsert(collection_name=self.collection, points=points)
+        # Upload straight from the float32 matrix instead of building a PointStruct per row
+        self.client.upload_collection(
+            collection_name=self.collection,
+            vectors=np.asarray(vectors, dtype=np.float32),
+            payload=payloads,
+            ids=ids,
+            batch_size=UPSERT_BATCH_SIZE,
+            wait=True,
+        )
+    
+    def delete_file_points(self, file_id: str, legacy_source: str = None):
+        """
+        Delete every point ingested for a file in one filtered delete.
+        
+        Args:
+            file_id: Catalog id stored in the point payloads
+            legacy_source: Also delete points of this source that predate
+                the file_id payload field
+        """
+        from qdrant_client.models import Filter, FieldCondition, MatchValue, FilterSelector, IsEmptyCondition, PayloadField
+        conditions = [FieldCondition(key="file_id", match=MatchValue(value=file_id))]
+        if legacy_source:
+            conditions.append(Filter(must=[
+                FieldCondition(key="source", match=MatchValue(value=legacy_source)),
+                IsEmptyCondition(is_empty=PayloadField(key="file_id")),
+            ]))
+        self.client.delete(
+            collection_name=self.collection,
+            points_selector=FilterSelector(filter=Filter(should=conditions)),
+            wait=True,
+        )
         
-    def search(self, query_vector, top_k: int = 5, source_filter: str = None):
+    @staticmethod
+    def _source_filter(source_filter: str = None):
         # Build query filter if source is specified
         # If source_filter is "__ALL__", search across all documents
-        query_filter = None
         if source_filter and source_filter != "__ALL__":
-            query_filter = Filter(
+            from qdrant_client.models import Filter, FieldCondition, MatchValue
+            return Filter(
                 must=[
                     FieldCondition(
                         key="source",
@@ -41,24 +120,64 @@ class QdrantStorage:
                     )
                 ]
             )
+        return None
+    
+    @staticmethod
+    def _to_hits(results) -> list[dict]:
+        hits = []
+        for r in results:
+            payload = getattr(r, 'payload', None) or {}
+            text = payload.get('text', '')
+            if text:
+                hits.append({"text": text, "source": payload.get('source', ''), "score": r.score})
+        return hits
         
-        results = self.client.search(
+    def search_candidates(self, query_vector, limit: int = 5, source_filter: str = None) -> list[dict]:
+        """Return raw hits as dicts with text, source and dense score."""
+        results = self.client.query_points(
             collection_name=self.collection,
-            query_vector=query_vector,
-            query_filter=query_filter,
+            query=np.asarray(query_vector, dtype=np.float32).tolist(),
+            query_filter=self._source_filter(source_filter),
             with_payload=True,
-            limit=top_k
+            limit=limit
         )
+        return self._to_hits(results.points)
+        
+    def search_many(self, query_vectors, limit: int = 5, source_filter: str = None) -> list[list[dict]]:
+        """Run several searches in one batched request; one hit list per vector."""
+        from qdrant_client.models import QueryRequest
+        query_filter = self._source_filter(source_filter)
+        requests = [
+            QueryRequest(query=vec, filter=query_filter, limit=limit, with_payload=True)
+            for vec in np.asarray(query_vectors, dtype=np.float32).tolist()
+        ]
+        results = self.client.query_batch_points(collection_name=self.collection, requests=requests)
+        return [self._to_hits(r.points) for r in results]
+        
+    @staticmethod
+    def to_result(hits: list[dict]) -> dict:
+        """Collapse hits into the contexts/sources shape used by the query step."""
         contexts = []
+        scores = []
         sources = set()
         
-        for r in results:
-            payload = getattr(r, 'payload', None) or {}
-            text = payload.get('text', '')
-            source = payload.get('source', '')
-            if text:
-                contexts.append(text)
-                sources.add(source)
+        for hit in hits:
+            contexts.append(hit["text"])
+            scores.append(hit["score"])
+            sources.add(hit["source"])
         
-        return {"contexts": contexts, "sources": list(sources)}
-        
\ No newline at end of file
+        return {"contexts": contexts, "sources": list(sources), "scores": scores}
+        
+    def search(self, query_vector, top_k: int = 5, source_filter: str = None, adaptive: bool = False):
+        # In adaptive mode top_k is an upper bound and weak trailing hits are dropped
+        if adaptive:
+            max_k = min(top_k, ADAPTIVE_MAX_K)
+            hits = self.search_candidates(query_vector, max_k, source_filter)
+            return self.to_result(adaptive_cutoff(hits, max_k=max_k))
+        return self.to_result(self.search_candidates(query_vector, top_k, source_filter))
+
+
+@fork_safe_cache
+def get_storage() -> QdrantStorage:
+    """Process-wide QdrantStorage, so requests reuse one pooled client."""
+    return QdrantStorage()
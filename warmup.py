@@ -0,0 +1,124 @@
+"""
+Startup warmup run by the app lifespan.
+Opens pooled connections, verifies the Qdrant collection, loads the
+tokenizer and optionally pre-warms the query-embedding cache, so the first
+requests after a deploy don't pay for it. /api/ready reports 503 until
+warmup has finished.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("uvicorn")
+
+# Set to false to report ready immediately (e.g. for local development)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() != "false"
+# Recent questions whose embeddings are pre-warmed; 0 disables it
+WARMUP_PREWARM_QUERIES = int(os.getenv("WARMUP_PREWARM_QUERIES", "0"))
+# Required steps are retried until they succeed, backing off up to this long
+WARMUP_MAX_BACKOFF_S = float(os.getenv("WARMUP_MAX_BACKOFF_S", "30"))
+# Optional steps get one attempt and hold readiness back at most this long
+WARMUP_OPTIONAL_TIMEOUT_S = float(os.getenv("WARMUP_OPTIONAL_TIMEOUT_S", "30"))
+
+_ready = not WARMUP_ENABLED
+_steps: dict[str, dict] = {}
+
+
+def _connect_qdrant() -> None:
+    from vector_db import get_storage
+    # Opens the pooled client and creates the collection if it is missing
+    storage = get_storage()
+    storage.client.get_collection(storage.collection)
+
+
+def _load_tokenizer() -> None:
+    from data_loader import chunk_texts
+    # The chunker loads its tokenizer on first use
+    chunk_texts(["Warmup sentence. Another one."])
+
+
+def _connect_openai() -> None:
+    from data_loader import get_client
+    from prompts import llm_client
+    get_client().models.list()
+    llm_client()
+
+
+def _prewarm_queries() -> None:
+    from shared_cache import get_shared_cache
+    from data_loader import embed_queries
+    questions = get_shared_cache().recent_queries(WARMUP_PREWARM_QUERIES)
+    if questions:
+        # Fills the shared cache; questions another worker already embedded cost nothing
+        embed_queries(questions)
+
+
+# (name, function, required): required steps are retried until they succeed,
+# the others get one attempt bounded by WARMUP_OPTIONAL_TIMEOUT_S
+_STEPS = [
+    ("qdrant", _connect_qdrant, True),
+    ("tokenizer", _load_tokenizer, True),
+    ("openai", _connect_openai, False),
+    ("query_cache", _prewarm_queries, False),
+]
+
+
+async def _run_step(name: str, fn, required: bool) -> None:
+    backoff = 0.5
+    attempts = 0
+    while True:
+        attempts += 1
+        started = time.perf_counter()
+        try:
+            if required:
+                await asyncio.to_thread(fn)
+            else:
+                await asyncio.wait_for(asyncio.to_thread(fn), WARMUP_OPTIONAL_TIMEOUT_S)
+            _steps[name] = {"status": "done", "seconds": round(time.perf_counter() - started, 3), "attempts": attempts}
+            return
+        except Exception as e:
+            _steps[name] = {"status": "retrying" if required else "failed", "error": str(e) or type(e).__name__, "attempts": attempts}
+            if not required:
+                logger.warning("Warmup step %s failed: %s", name, e)
+                return
+            logger.warning("Warmup step %s failed, retrying in %.1fs: %s", name, backoff, e)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, WARMUP_MAX_BACKOFF_S)
+
+
+async def run() -> None:
+    """Run all warmup steps concurrently and mark the app ready when they end."""
+    global _ready
+    if not WARMUP_ENABLED:
+        return
+    started = time.perf_counter()
+    for name, _, _ in _STEPS:
+        _steps[name] = {"status": "pending"}
+    if WARMUP_PREWARM_QUERIES <= 0:
+        _steps["query_cache"] = {"status": "skipped"}
+    steps = [
+        _run_step(name, fn, required)
+        for name, fn, required in _STEPS
+        if _steps[name]["status"] == "pending"
+    ]
+    await asyncio.gather(*steps)
+    _ready = True
+    logger.info("Warmup finished in %.2fs: %s", time.perf_counter() - started, _steps)
+
+
+def start() -> Optional[asyncio.Task]:
+    """Start warmup in the background so liveness checks pass meanwhile."""
+    if not WARMUP_ENABLED:
+        return None
+    return asyncio.create_task(run())
+
+
+def status() -> dict:
+    """Readiness and per-step warmup state."""
+    return {"ready": _ready, "steps": dict(_steps)}